@@ -0,0 +1,545 @@
+# ================================================================
+# 🌹 MIRI RENCONTRE — BANC DE CHARGE HORS LIGNE
+# ================================================================
+# Rejoue des charges scriptées dans les VRAIS handlers du bot, sans Discord :
+# guilde, salons, threads, DM et interactions sont simulés (latence + 429).
+#   python bench_rencontre.py                       → scénario par défaut
+#   python bench_rencontre.py --profiles 5000 --clicks 200 --duration 10 --mode sqlite
+# Rapporte débit, latences p50/p99 (réponse et handler complet), amplification
+# d’écriture du Storage et croissance mémoire par phase.
+# ================================================================
+import os, sys, time, json, random, shutil, asyncio, argparse, tempfile, itertools, types, tracemalloc
+from collections import Counter
+from typing import Dict, Any, Optional, List
+
+def parse_args() -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Banc de charge hors ligne — Miri Rencontre")
+    p.add_argument("--mode", default="json", choices=("json", "journal", "sqlite"), help="STORAGE_MODE testé")
+    p.add_argument("--profiles", type=int, default=5000, help="profils préchargés")
+    p.add_argument("--onboard", type=int, default=200, help="créations de profil complètes en DM")
+    p.add_argument("--clicks", type=int, default=200, help="clics ❤️/❌/📩 par seconde")
+    p.add_argument("--duration", type=float, default=10.0, help="durée de la tempête de clics (s)")
+    p.add_argument("--speed", type=int, default=40, help="participants speed dating")
+    p.add_argument("--rounds", type=int, default=3, help="tours de speed dating")
+    p.add_argument("--latency-ms", type=float, default=40.0, help="latence moyenne d’un appel Discord simulé")
+    p.add_argument("--rate-limit", type=float, default=0.01, help="probabilité qu’un appel reçoive un 429")
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--json", action="store_true", help="rapport JSON sur stdout")
+    return p.parse_args()
+
+ARGS = parse_args()
+random.seed(ARGS.seed)
+
+# Le bot lit sa config à l’import : stockage dans un dossier jetable, pas d’endpoint.
+_TMP = tempfile.mkdtemp(prefix="rencontre_bench_")
+os.environ.update({
+    "DISCORD_TOKEN": "bench",
+    "STORAGE_MODE": ARGS.mode,
+    "DATA_FILE": os.path.join(_TMP, "rencontre_data.json"),
+    "DB_FILE": os.path.join(_TMP, "rencontre_data.db"),
+    "METRICS_PORT": "0",
+})
+tracemalloc.start()
+import discord                      # noqa: E402
+import miri_rencontre as rb         # noqa: E402
+
+# ================================================================
+# FAUSSE COUCHE DISCORD
+# ================================================================
+_ids = itertools.count(10**17)
+
+class FakeAPI:
+    """Chaque appel REST simulé : latence exponentielle, 429 éventuel (attente puis réessai,
+    comme discord.py le fait en interne), comptage par route."""
+    def __init__(self, latency_ms: float, p429: float):
+        self.latency = latency_ms / 1000
+        self.p429 = p429
+        self.calls: Counter = Counter()
+        self.rate_limited = 0
+
+    async def call(self, route: str):
+        self.calls[route] += 1
+        while random.random() < self.p429:
+            self.rate_limited += 1
+            await asyncio.sleep(random.uniform(0.2, 1.0))
+        await asyncio.sleep(random.expovariate(1 / self.latency) if self.latency else 0)
+
+API = FakeAPI(ARGS.latency_ms, ARGS.rate_limit)
+
+class FakeAsset:
+    url = "https://cdn.example/avatar.png"
+
+class FakePerms:
+    def __init__(self, admin: bool = False):
+        self.administrator = admin
+        self.manage_channels = admin
+
+class FakeRole:
+    def __init__(self, rid: int):
+        self.id = rid
+
+class FakeDM:
+    def __init__(self):
+        self.id = next(_ids)
+
+    async def send(self, content=None, **kwargs):
+        await API.call("POST /channels/{dm}/messages")
+        return FakeMessage(self, content)
+
+class FakeMember:
+    def __init__(self, guild: "FakeGuild", uid: int, admin: bool = False):
+        self.guild = guild
+        self.id = uid
+        self.display_name = f"membre{uid % 100000}"
+        self.mention = f"<@{uid}>"
+        self.roles: List[FakeRole] = []
+        self.bot = False
+        self.guild_permissions = FakePerms(admin)
+        self.display_avatar = FakeAsset()
+        self.created_at = discord.utils.utcnow()
+        self._dm = FakeDM()
+
+    def __str__(self) -> str:
+        return self.display_name
+
+    async def create_dm(self):
+        return self._dm
+
+    async def send(self, *a, **k):
+        return await self._dm.send(*a, **k)
+
+    async def add_roles(self, *roles, reason=None):
+        await API.call("PUT /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+        self.roles.extend(r for r in roles if r not in self.roles)
+
+    async def remove_roles(self, *roles, reason=None):
+        await API.call("DELETE /guilds/{guild_id}/members/{user_id}/roles/{role_id}")
+        self.roles = [r for r in self.roles if r not in roles]
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embeds=None, author_id: int = 0):
+        self.id = next(_ids)
+        self.channel = channel
+        self.content = content or ""
+        self.embeds = embeds or []
+        self.components: list = []
+        self.attachments: list = []
+        self.author = types.SimpleNamespace(id=author_id, bot=bool(author_id))
+        self.guild = None
+        self.created_at = discord.utils.utcnow()
+
+    async def edit(self, **kwargs):
+        await API.call("PATCH /channels/{channel_id}/messages/{message_id}")
+        if "content" in kwargs:
+            self.content = kwargs["content"]
+        return self
+
+    async def delete(self):
+        await API.call("DELETE /channels/{channel_id}/messages/{message_id}")
+        if isinstance(getattr(self.channel, "messages", None), dict):
+            self.channel.messages.pop(self.id, None)
+
+class FakeThread(discord.Thread):
+    def __init__(self, guild: "FakeGuild", parent: "FakeTextChannel", name: str):
+        self.id = next(_ids)
+        self.name = name
+        self.guild = guild
+        self.parent_id = parent.id
+        self.members_added: List[int] = []
+        self.deleted = False
+
+    async def add_user(self, user):
+        await API.call("PUT /channels/{channel_id}/thread-members/{user_id}")
+        self.members_added.append(user.id)
+
+    async def send(self, content=None, **kwargs):
+        await API.call("POST /channels/{channel_id}/messages")
+        return FakeMessage(self, content)
+
+    async def edit(self, **kwargs):
+        await API.call("PATCH /channels/{channel_id}")
+
+    async def delete(self):
+        await API.call("DELETE /channels/{channel_id}")
+        self.deleted = True
+        self.guild.threads.pop(self.id, None)
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild: "FakeGuild", cid: int, name: str):
+        self.id = cid
+        self.name = name
+        self.guild = guild
+        self.messages: Dict[int, FakeMessage] = {}
+
+    @property
+    def mention(self) -> str:
+        return f"<#{self.id}>"
+
+    async def send(self, content=None, *, embed=None, embeds=None, view=None, **kwargs):
+        await API.call("POST /channels/{channel_id}/messages")
+        msg = FakeMessage(self, content, embeds or ([embed] if embed else []), author_id=self.guild.me.id)
+        self.messages[msg.id] = msg
+        return msg
+
+    def get_partial_message(self, mid: int):
+        return self.messages.get(mid) or FakeMessage(self)
+
+    async def fetch_message(self, mid: int):
+        await API.call("GET /channels/{channel_id}/messages/{message_id}")
+        if mid not in self.messages:
+            raise discord.NotFound(types.SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        return self.messages[mid]
+
+    async def history(self, limit=None, **kwargs):
+        await API.call("GET /channels/{channel_id}/messages")
+        for msg in list(self.messages.values())[::-1][:limit]:
+            yield msg
+
+    async def delete_messages(self, messages, **kwargs):
+        await API.call("POST /channels/{channel_id}/messages/bulk-delete")
+        for m in messages:
+            self.messages.pop(m.id, None)
+
+    async def create_thread(self, *, name: str, **kwargs):
+        await API.call("POST /channels/{channel_id}/threads")
+        th = FakeThread(self.guild, self, name)
+        self.guild.threads[th.id] = th
+        return th
+
+    async def archived_threads(self, **kwargs):
+        await API.call("GET /channels/{channel_id}/threads/archived")
+        for th in ():
+            yield th
+
+class FakeGuild:
+    def __init__(self):
+        self.id = rb.GUILD_ID
+        self.name = "Banc de charge"
+        self.icon = None
+        self.me = types.SimpleNamespace(id=next(_ids))
+        self.members: Dict[int, FakeMember] = {}
+        self.threads: Dict[int, FakeThread] = {}
+        names = {rb.CH_GIRLS: "filles", rb.CH_BOYS: "garcons", rb.CH_SPEED: "speed", rb.CH_LOGS: "logs", rb.CH_WELCOME: "accueil"}
+        self.channels = {cid: FakeTextChannel(self, cid, n) for cid, n in names.items() if cid}
+        self.roles = {rb.ROLE_ACCESS: FakeRole(rb.ROLE_ACCESS)} if rb.ROLE_ACCESS else {}
+
+    def add_member(self, uid: int, admin: bool = False) -> FakeMember:
+        m = self.members[uid] = FakeMember(self, uid, admin)
+        return m
+
+    def get_member(self, uid: int):
+        return self.members.get(uid)
+
+    def get_channel(self, cid: int):
+        return self.channels.get(cid)
+
+    def get_role(self, rid: int):
+        return self.roles.get(rid)
+
+    def get_thread(self, tid: int):
+        return self.threads.get(tid)
+
+    async def active_threads(self):
+        await API.call("GET /guilds/{guild_id}/threads/active")
+        return list(self.threads.values())
+
+class FakeResponse:
+    def __init__(self, inter: "FakeInteraction"):
+        self.inter = inter
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _ack(self, route: str):
+        if self._done:
+            raise discord.InteractionResponded(self.inter)  # type: ignore[arg-type]
+        self._done = True
+        await API.call(route)
+        self.inter.acked_at = time.perf_counter()
+
+    async def send_message(self, content=None, **kwargs):
+        await self._ack("POST /interactions/{id}/{token}/callback")
+
+    async def defer(self, **kwargs):
+        await self._ack("POST /interactions/{id}/{token}/callback")
+
+    async def send_modal(self, modal):
+        await self._ack("POST /interactions/{id}/{token}/callback")
+        self.inter.modal = modal
+
+class FakeFollowup:
+    async def send(self, content=None, **kwargs):
+        await API.call("POST /webhooks/{id}/{token}")
+        return FakeMessage(None, content)
+
+class FakeInteraction:
+    def __init__(self, guild: FakeGuild, user: FakeMember, message: Optional[FakeMessage] = None):
+        self.id = next(_ids)
+        self.guild = guild
+        self.guild_id = guild.id
+        self.user = user
+        self.message = message
+        self.created = time.perf_counter()
+        self.acked_at: Optional[float] = None
+        self.modal = None
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup()
+        self.client = None
+
+    async def edit_original_response(self, **kwargs):
+        await API.call("PATCH /webhooks/{id}/{token}/messages/@original")
+
+class FakeButton:
+    custom_id = "bench"
+
+# ================================================================
+# MESURES
+# ================================================================
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    s = sorted(values)
+    return s[min(len(s) - 1, int(q * len(s)))]
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class Phase:
+    """Une phase du scénario : latences par handler, écritures Storage et mémoire avant/après."""
+    def __init__(self, name: str):
+        self.name = name
+        self.ack: Dict[str, List[float]] = {}
+        self.total: Dict[str, List[float]] = {}
+        self.errors: Counter = Counter()
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        self.st0 = dict(rb.storage.stats)
+        self.api0 = sum(API.calls.values())
+        self.rl0 = API.rate_limited
+        self.mem0 = tracemalloc.get_traced_memory()[0]
+        self.rss0 = rss_mb()
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.t0
+        return False
+
+    async def run(self, handler: str, coro, inter: Optional[FakeInteraction] = None):
+        t0 = time.perf_counter()
+        try:
+            await coro
+        except Exception as e:
+            self.errors[f"{handler}: {type(e).__name__}: {e}"[:160]] += 1
+        t1 = time.perf_counter()
+        self.total.setdefault(handler, []).append((t1 - t0) * 1000)
+        if inter is not None and inter.acked_at is not None:
+            self.ack.setdefault(handler, []).append((inter.acked_at - t0) * 1000)
+
+    def report(self) -> Dict[str, Any]:
+        st = rb.storage.stats
+        writes = st["writes"] - self.st0["writes"]
+        flushes = st["flushes"] - self.st0["flushes"]
+        written = st["total_flush_bytes"] - self.st0["total_flush_bytes"]
+        ops = sum(len(v) for v in self.total.values())
+        return {
+            "phase": self.name,
+            "seconds": round(self.elapsed, 2),
+            "ops": ops,
+            "ops_per_s": round(ops / self.elapsed, 1) if self.elapsed else 0,
+            "handlers": {
+                h: {
+                    "n": len(v),
+                    "ack_p50_ms": round(percentile(self.ack[h], 0.50), 1) if h in self.ack else None,
+                    "ack_p99_ms": round(percentile(self.ack[h], 0.99), 1) if h in self.ack else None,
+                    "p50_ms": round(percentile(v, 0.50), 1),
+                    "p99_ms": round(percentile(v, 0.99), 1),
+                } for h, v in self.total.items()
+            },
+            "errors": dict(self.errors),
+            "discord_calls": sum(API.calls.values()) - self.api0,
+            "rate_limited": API.rate_limited - self.rl0,
+            "storage": {
+                "writes": int(writes),
+                "flushes": int(flushes),
+                "bytes": int(written),
+                "bytes_per_write": round(written / writes, 1) if writes else 0,
+                "writes_per_flush": round(writes / flushes, 1) if flushes else 0,
+            },
+            "memory": {
+                "traced_mb": round((tracemalloc.get_traced_memory()[0] - self.mem0) / 2**20, 2),
+                "rss_mb": round(rss_mb() - self.rss0, 1),
+            },
+        }
+
+# ================================================================
+# SCÉNARIOS
+# ================================================================
+PASSIONS = ["cinéma", "randonnée", "musique", "jeux vidéo", "cuisine", "lecture", "voyage", "danse", "escalade", "photo", "yoga", "séries"]
+
+def fake_profile() -> Dict[str, Any]:
+    return {
+        "age": random.randint(18, 55),
+        "genre": random.choice(("Femme", "Homme")),
+        "orientation": random.choice(("hétéro", "hétéro", "bi", "gay", "pan")),
+        "passions": ", ".join(random.sample(PASSIONS, 3)),
+        "activite": random.choice(("étudiante", "infirmier", "développeuse", "artisan", "prof")),
+        "photo_url": "https://cdn.example/p.png",
+    }
+
+async def seed_profiles(guild: FakeGuild, n: int) -> List[int]:
+    """Profils + fiches existants, écrits directement (hors mesure des handlers)."""
+    uids = []
+    for _ in range(n):
+        uid = next(_ids)
+        guild.add_member(uid)
+        prof = fake_profile()
+        await rb.storage.set_profile(uid, prof)
+        ch = rb.target_channel_for(guild, prof)
+        msg = FakeMessage(ch, author_id=guild.me.id)
+        ch.messages[msg.id] = msg
+        await rb.storage.set_profile_msg(uid, ch.id, msg.id)
+        uids.append(uid)
+    await rb.storage.flush()
+    return uids
+
+async def onboarding(bot: "rb.RencontreBot", guild: FakeGuild, n: int, phase: Phase):
+    """Création de profil complète en DM via on_message, n membres en parallèle."""
+    async def one():
+        member = guild.add_member(next(_ids))
+        await rb.start_onboarding(member.id)
+        prof = fake_profile()
+        answers = [str(prof["age"]), prof["genre"], prof["orientation"], prof["passions"], prof["activite"], prof["photo_url"]]
+        for text in answers:
+            msg = FakeMessage(member._dm, text)
+            msg.author = member
+            await phase.run("on_message", bot.on_message(msg))
+            await asyncio.sleep(random.uniform(0.05, 0.3))  # temps de frappe
+    await asyncio.gather(*(one() for _ in range(n)))
+
+async def click_storm(guild: FakeGuild, owners: List[int], rate: int, duration: float, phase: Phase):
+    """❤️ / ❌ / 📩 (+ envoi du modal) au rythme `rate` par seconde, via ProfileView."""
+    view = rb.ProfileView(owner_id=0)   # vue persistante : propriétaire résolu par message_id
+    clickers = [guild.add_member(next(_ids)) for _ in range(max(50, rate * 2))]
+    tasks: List[asyncio.Task] = []
+
+    async def click():
+        owner = random.choice(owners)
+        ref = rb.storage.get_profile_msg(owner)
+        if not ref:
+            return
+        ch = guild.get_channel(ref["channel_id"])
+        card = ch.messages.get(ref["message_id"]) or FakeMessage(ch)
+        card.id = ref["message_id"]
+        inter = FakeInteraction(guild, random.choice(clickers), card)
+        roll = random.random()
+        if roll < 0.7:
+            await phase.run("like", rb.ProfileView.like(view, inter, FakeButton()), inter)
+        elif roll < 0.9:
+            await phase.run("pass", rb.ProfileView._pass(view, inter, FakeButton()), inter)
+        else:
+            await phase.run("contact", rb.ProfileView.contact(view, inter, FakeButton()), inter)
+            if inter.modal is not None:
+                inter.modal.message._value = "Salut ! On partage la même passion 😊"
+                submit = FakeInteraction(guild, inter.user, card)
+                await phase.run("contact_submit", inter.modal.on_submit(submit), submit)
+
+    start = time.perf_counter()
+    for i in range(int(rate * duration)):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(click()))
+    await asyncio.gather(*tasks)
+
+async def speed_session(bot: "rb.RencontreBot", guild: FakeGuild, owners: List[int], n: int, rounds: int, phase: Phase):
+    """/speeddating réel, puis tours accélérés (quelques secondes) joués par speed_scheduler."""
+    admin = guild.add_member(next(_ids), admin=True)
+    participants = " ".join(f"<@{u}>" for u in random.sample(owners, min(n, len(owners))))
+    cog = rb.SpeedCog(bot)
+    cmd = next(c for c in rb.SpeedCog.__cog_app_commands__ if c.name == "speeddating")
+    inter = FakeInteraction(guild, admin)
+    await phase.run("speeddating", cmd.callback(cog, inter, participants, couples=n // 2, duree="20m", tours=rounds), inter)
+    sid, s = max(rb.storage.data["speed_sessions"].items(), key=lambda kv: kv[1].get("starts_at", 0))
+    round_s = 1
+    s.update(starts_at=time.time(), round_seconds=round_s, ends_at=time.time() + round_s * len(s["rounds"]))
+    await rb.storage.set_speed_session(sid, s)
+    rb.speed_scheduler.schedule(sid)
+    t0 = time.perf_counter()
+    deadline = time.time() + round_s * len(s["rounds"]) + 60
+    while not rb.storage.data["speed_sessions"][sid].get("closed") and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    phase.total.setdefault("speed_rounds", []).append((time.perf_counter() - t0) * 1000)
+
+# ================================================================
+# RAPPORT
+# ================================================================
+def print_report(phases: List[Dict[str, Any]]):
+    print(f"\n=== Banc de charge — mode {ARGS.mode}, {ARGS.profiles} profils, latence {ARGS.latency_ms:g} ms, 429 {ARGS.rate_limit:.0%} ===")
+    for p in phases:
+        st, mem = p["storage"], p["memory"]
+        print(f"\n▶ {p['phase']} — {p['ops']} ops en {p['seconds']} s ({p['ops_per_s']}/s), "
+              f"{p['discord_calls']} appels Discord, {p['rate_limited']} × 429")
+        for h, v in p["handlers"].items():
+            ack = f"réponse p50 {v['ack_p50_ms']:>7} ms  p99 {v['ack_p99_ms']:>7} ms" if v["ack_p50_ms"] is not None else " " * 36
+            print(f"   {h:<15} n={v['n']:<6} {ack} | complet p50 {v['p50_ms']:>8} ms  p99 {v['p99_ms']:>8} ms")
+        print(f"   stockage : {st['writes']} écritures → {st['flushes']} flushs ({st['writes_per_flush']}/flush), "
+              f"{st['bytes'] / 1024:.0f} Ko ({st['bytes_per_write']} o/écriture)")
+        print(f"   mémoire : +{mem['traced_mb']} Mo alloués (tracemalloc), RSS +{mem['rss_mb']} Mo")
+        for err, n in p["errors"].items():
+            print(f"   ⚠️ {err} × {n}")
+
+async def main():
+    bot = rb.RencontreBot()
+    guild = FakeGuild()
+    bot.get_guild = lambda gid: guild   # type: ignore[assignment]
+
+    async def ready():
+        return None
+    bot.wait_until_ready = ready        # pas de gateway : le bot est « prêt » d’emblée
+
+    async def no_prefix_commands(message):
+        return None
+    bot.process_commands = no_prefix_commands  # aucune commande « ! » ; évite l’état de connexion
+    await rb.partitions.enter(rb.GUILD_ID)  # partition principale (FakeGuild)
+    rb.log_queue.start()
+    rb.rest.start()
+    rb.speed_scheduler.start(bot)
+    results = []
+    try:
+        with Phase("préchargement") as ph:
+            t0 = time.perf_counter()
+            owners = await seed_profiles(guild, ARGS.profiles)
+            ph.total["seed"] = [(time.perf_counter() - t0) * 1000]
+        results.append(ph.report())
+        with Phase("onboarding DM") as ph:
+            await onboarding(bot, guild, ARGS.onboard, ph)
+        results.append(ph.report())
+        with Phase(f"tempête de clics ({ARGS.clicks}/s)") as ph:
+            await click_storm(guild, owners, ARGS.clicks, ARGS.duration, ph)
+        results.append(ph.report())
+        if ARGS.speed >= 2:
+            with Phase("speed dating") as ph:
+                await speed_session(bot, guild, owners, ARGS.speed, ARGS.rounds, ph)
+            results.append(ph.report())
+    finally:
+        await rb.log_queue.close()
+        await rb.rest.close()
+        await rb.partitions.close()
+        shutil.rmtree(_TMP, ignore_errors=True)
+    if ARGS.json:
+        json.dump({"args": vars(ARGS), "phases": results, "routes": dict(API.calls.most_common())}, sys.stdout, ensure_ascii=False, indent=2)
+    else:
+        print_report(results)
+        print("\nAppels Discord les plus fréquents :")
+        for route, n in API.calls.most_common(8):
+            print(f"   {n:>7}  {route}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -4,14 +4,22 @@
 # Dépendances : discord.py >= 2.4  →  pip install -U discord.py
 # Variables d’environnement indispensables :
 #   DISCORD_TOKEN
-#   GUILD_ID          (défaut 1382730341944397967)
-# Recommandées (IDs salons/rôle) :
+#   GUILD_ID          (défaut 1382730341944397967) — guilde principale
+# Recommandées (IDs salons/rôle de la guilde principale ; les autres via /rencontre_setup) :
 #   ROLE_ACCESS, CH_GIRLS, CH_BOYS, CH_SPEED, CH_LOGS, CH_WELCOME
+# Stockage :
+#   DATA_FILE, STORAGE_MODE (json | journal | sqlite), JOURNAL_COMPACT_EVERY, DB_FILE, FLUSH_INTERVAL_MS
+#   GUILDS_DIR, PARTITION_IDLE_S (une partition par guilde secondaire)
+# Multi-guildes : AUTO_SHARD
 # ================================================================
 
-import os, re, json, asyncio, time, random
+import os, re, json, asyncio, time, random, signal, sqlite3, heapq, unicodedata, hashlib, functools, logging, shutil
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
+from collections import OrderedDict, deque
+from contextvars import ContextVar
+from bisect import bisect_left, insort
+from array import array
+from typing import Dict, Any, Optional, List, Tuple, Callable
 from zoneinfo import ZoneInfo
 
 import discord
@@ -35,12 +43,49 @@ CH_LOGS       = env_int("CH_LOGS",       1403154919913033728)
 CH_WELCOME    = env_int("CH_WELCOME",    1400808431941849178)
 
 DATA_FILE     = os.getenv("DATA_FILE", "rencontre_data.json")
+STORAGE_MODE  = os.getenv("STORAGE_MODE", "json").strip().lower()  # json | journal | sqlite
+DB_FILE       = os.getenv("DB_FILE", "rencontre_data.db")           # si STORAGE_MODE=sqlite
+JOURNAL_COMPACT_EVERY = env_int("JOURNAL_COMPACT_EVERY", 500)       # lignes de journal avant compaction
+FLUSH_INTERVAL_MS = env_int("FLUSH_INTERVAL_MS", 500)               # délai max de regroupement des écritures
+GUILDS_DIR    = os.getenv("GUILDS_DIR", os.path.join(os.path.dirname(DATA_FILE) or ".", "guilds"))  # <guild_id>.json / .db
+PARTITION_IDLE_S = env_int("PARTITION_IDLE_S", 3600)                # partition inactive déchargée après ce délai
+AUTO_SHARD    = env_int("AUTO_SHARD", 0)                            # 1 → AutoShardedBot (beaucoup de guildes)
 BRAND_COLOR   = 0x7C3AED
 TZ = ZoneInfo("Europe/Paris")
 
 LIKE_COOLDOWN_DEFAULT    = 600  # s
 CONTACT_COOLDOWN_DEFAULT = 600  # s
 
+COOLDOWN_MAX_ENTRIES = env_int("COOLDOWN_MAX_ENTRIES", 50000)  # par type (like / contact)
+COOLDOWN_SNAPSHOT_S  = env_int("COOLDOWN_SNAPSHOT_S", 60)      # persistance périodique
+
+SPEED_CONCURRENCY = env_int("SPEED_CONCURRENCY", 4)  # threads speed dating provisionnés en parallèle
+SPEED_REMATCH_DAYS = env_int("SPEED_REMATCH_DAYS", 30)  # rencontres speed plus récentes évitées par la rotation
+SPEED_RETENTION_DAYS = max(SPEED_REMATCH_DAYS, env_int("SPEED_RETENTION_DAYS", 90))  # sessions closes gardées (historique)
+RECONCILE_CONCURRENCY = env_int("RECONCILE_CONCURRENCY", 4)  # fiches republiées en parallèle
+RECONCILE_ON_START = env_int("RECONCILE_ON_START", 0)        # 1 → réconciliation des fiches au démarrage
+ONBOARDING_TTL_S   = env_int("ONBOARDING_TTL_S", 3600)        # création de profil en DM abandonnée après ce délai
+DEPARTURE_FLUSH_S  = env_int("DEPARTURE_FLUSH_MS", 3000) / 1000  # départs regroupés sur cette fenêtre
+DEPARTURE_BATCH_MAX = env_int("DEPARTURE_BATCH_MAX", 200)      # départs traités par lot
+SWEEP_INTERVAL_S   = env_int("SWEEP_INTERVAL_S", 6 * 3600)    # balayage des profils orphelins (0 = désactivé)
+SWEEP_BATCH        = env_int("SWEEP_BATCH", 50)               # profils orphelins supprimés par lot
+SWEEP_PAUSE_S      = env_int("SWEEP_PAUSE_MS", 1000) / 1000   # pause entre deux lots
+SWEEP_MAX_WAIT_S   = env_int("SWEEP_MAX_WAIT_MS", 10000) / 1000  # attente max des interactions en cours par lot
+
+METRICS_PORT       = env_int("METRICS_PORT", 9108)            # endpoint Prometheus sur 127.0.0.1 (0 = désactivé)
+
+REST_CONCURRENCY   = env_int("REST_CONCURRENCY", 8)           # appels REST de fond simultanés (hors réponses d’interaction)
+REST_SHED_DEPTH    = env_int("REST_SHED_DEPTH", 20)           # au-delà, les étapes cosmétiques sont abandonnées
+REST_SHED_WAIT_S   = env_int("REST_SHED_WAIT_MS", 1000) / 1000  # étape cosmétique abandonnée si elle a attendu plus
+
+LOG_QUEUE_MAX    = env_int("LOG_QUEUE_MAX", 500)     # au-delà de la moitié, les logs mineurs sont ignorés
+LOG_FLUSH_S      = env_int("LOG_FLUSH_MS", 2000) / 1000
+LOG_LOW_PRIORITY = {"Pass"}                           # actions sacrifiables sous charge
+
+_DELETED = object()  # marqueur de suppression pour le journal
+_ID_SETS = ("banned_users", "owners")  # set[int] en mémoire, liste triée sur disque
+_EDGE_SETS = ("likes",)                 # {uid: set[uid]} en mémoire, clé d’enregistrement "a:b"
+
 intents = discord.Intents.default()
 intents.guilds = True
 intents.members = True
@@ -48,38 +93,753 @@ intents.message_content = True
 
 GUILD_OBJ = discord.Object(id=GUILD_ID)
 
+# ================================================================
+# MÉTRIQUES
+# ================================================================
+# Compteurs et histogrammes en mémoire (quelques opérations de dict par mesure) :
+# exposés en texte Prometheus sur 127.0.0.1:METRICS_PORT et via /rencontre_metrics.
+_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+class Metrics:
+    def __init__(self):
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.histograms: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], List[float]] = {}  # [compte par seau…, +Inf, somme]
+        self.gauge_sources: List[Callable[[], List[Tuple[str, Dict[str, str], float]]]] = []
+        self.inflight = 0  # handlers instrumentés en cours (les tâches de fond leur cèdent la place)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        k = (name, tuple(sorted(labels.items())))
+        self.counters[k] = self.counters.get(k, 0) + value
+
+    def observe(self, name: str, ms: float, **labels: str):
+        k = (name, tuple(sorted(labels.items())))
+        h = self.histograms.get(k)
+        if h is None:
+            h = self.histograms[k] = [0.0] * (len(_LATENCY_BUCKETS_MS) + 2)
+        h[bisect_left(_LATENCY_BUCKETS_MS, ms)] += 1
+        h[-1] += ms
+
+    def swallowed(self, where: str):
+        """À appeler dans les `except Exception` qui ignorent volontairement l’erreur."""
+        self.inc("rencontre_swallowed_exceptions_total", where=where)
+
+    def total(self, name: str) -> Dict[Tuple[Tuple[str, str], ...], float]:
+        return {labels: v for (n, labels), v in self.counters.items() if n == name}
+
+    def quantile(self, name: str, q: float, **labels: str) -> Optional[float]:
+        """Borne haute du seau contenant le quantile q (approximation classique)."""
+        h = self.histograms.get((name, tuple(sorted(labels.items()))))
+        if not h:
+            return None
+        n = sum(h[:-1])
+        rank, acc = q * n, 0.0
+        for i, c in enumerate(h[:-1]):
+            acc += c
+            if acc >= rank and c:
+                return float(_LATENCY_BUCKETS_MS[i]) if i < len(_LATENCY_BUCKETS_MS) else float("inf")
+        return None
+
+    def render(self) -> str:
+        def fmt(labels) -> str:
+            items = labels.items() if isinstance(labels, dict) else labels
+            inner = ",".join(f'{k}="{v}"' for k, v in items)
+            return "{" + inner + "}" if inner else ""
+        out: List[str] = []
+        for (name, labels), v in sorted(self.counters.items()):
+            out.append(f"{name}{fmt(labels)} {v:g}")
+        for (name, labels), h in sorted(self.histograms.items()):
+            acc = 0.0
+            for i, c in enumerate(h[:-1]):
+                acc += c
+                le = str(_LATENCY_BUCKETS_MS[i]) if i < len(_LATENCY_BUCKETS_MS) else "+Inf"
+                out.append(f"{name}_bucket{fmt(labels + (('le', le),))} {acc:g}")
+            out.append(f"{name}_sum{fmt(labels)} {h[-1]:.3f}")
+            out.append(f"{name}_count{fmt(labels)} {acc:g}")
+        for source in self.gauge_sources:
+            try:
+                for name, labels, v in source():
+                    out.append(f"{name}{fmt(labels)} {v:g}")
+            except Exception as e:
+                out.append(f"# gauge error: {e}")
+        return "\n".join(out) + "\n"
+
+    async def serve(self, port: int):
+        """Endpoint HTTP minimal, lié à 127.0.0.1 uniquement (GET quelconque → métriques)."""
+        async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=5)
+                body = self.render().encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                    + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+            except Exception:
+                self.swallowed("metrics_http")
+            finally:
+                writer.close()
+        self._server = await asyncio.start_server(handle, "127.0.0.1", port)
+        print(f"[METRICS] http://127.0.0.1:{port}/metrics")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+metrics = Metrics()
+
+def instrumented(handler: str):
+    """Mesure la latence d’un handler async et compte ses exceptions (relancées).
+    À placer juste au-dessus du `def` (sous @discord.ui.button / @app_commands.command)."""
+    def deco(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            metrics.inflight += 1
+            try:
+                return await fn(*args, **kwargs)
+            except Exception:
+                metrics.inc("rencontre_handler_errors_total", handler=handler)
+                raise
+            finally:
+                metrics.inflight -= 1
+                metrics.observe("rencontre_handler_latency_ms", (time.perf_counter() - t0) * 1000, handler=handler)
+        return wrapper
+    return deco
+
+class _RateLimitCounter(logging.Handler):
+    """discord.py signale ses 429 par le logger discord.http : on les compte."""
+    def emit(self, record: logging.LogRecord):
+        fmt = str(record.msg)
+        if fmt.startswith("We are being rate limited"):
+            metrics.inc("discord_rate_limited_total")
+        elif fmt.startswith("Global rate limit"):
+            metrics.inc("discord_global_rate_limited_total")
+
+def instrument_http(client: discord.Client):
+    """Compte les appels REST par route (gabarit, ex. POST /channels/{channel_id}/messages)."""
+    http = client.http
+    orig = http.request
+
+    async def request(route, **kwargs):
+        key = f"{route.method} {route.path}"
+        t0 = time.perf_counter()
+        try:
+            return await orig(route, **kwargs)
+        except discord.HTTPException as e:
+            metrics.inc("discord_rest_errors_total", route=key, status=str(e.status))
+            raise
+        finally:
+            metrics.inc("discord_rest_requests_total", route=key)
+            metrics.observe("discord_rest_latency_ms", (time.perf_counter() - t0) * 1000, route=key)
+    http.request = request
+    logging.getLogger("discord.http").addHandler(_RateLimitCounter(level=logging.WARNING))
+
+# ================================================================
+# ENVOIS REST PRIORISÉS
+# ================================================================
+# Les réponses d’interaction partent en direct ; le reste (DM, rôles/threads, logs,
+# animations) passe par RestScheduler : REST_CONCURRENCY workers servent d’abord la
+# classe la plus prioritaire, au plus `route_limit` appels en vol par route (même bucket
+# Discord → inutile d’y bloquer plusieurs workers), et logs/cosmétique n’occupent jamais
+# plus de la moitié des workers. Sous charge, les étapes cosmétiques sont abandonnées.
+REST_DM, REST_MODERATION, REST_LOG, REST_COSMETIC = range(4)
+_REST_CLASSES = ("dm", "moderation", "log", "cosmetic")
+
+class RestShed(Exception):
+    """Étape cosmétique abandonnée (file chargée ou attente trop longue)."""
+
+class RestScheduler:
+    SCAN = 32  # éléments examinés par classe pour trouver une route libre
+
+    def __init__(self, workers: int = REST_CONCURRENCY):
+        self.workers = max(1, workers)
+        self.low_cap = max(1, self.workers // 2)
+        self._queues: List[deque] = [deque() for _ in _REST_CLASSES]
+        self._busy: Dict[str, int] = {}
+        self._low_running = 0
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._closing = False
+
+    def start(self):
+        if not self._tasks:
+            self._closing = False
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def close(self):
+        """Vide la file puis arrête les workers."""
+        if self._tasks:
+            self._closing = True
+            self._wake.set()
+            await asyncio.gather(*self._tasks)
+            self._tasks = []
+
+    def depth(self, prio: Optional[int] = None) -> int:
+        if prio is None:
+            return sum(len(q) for q in self._queues)
+        return len(self._queues[prio])
+
+    async def call(self, prio: int, route: str, fn: Callable[[], Any], route_limit: int = 1) -> Any:
+        """Exécute la coroutine fn() à son tour ; REST_COSMETIC peut lever RestShed."""
+        if not self._tasks:  # pas de workers (script, arrêt) → appel direct
+            return await fn()
+        if prio == REST_COSMETIC and self.depth() >= REST_SHED_DEPTH:
+            metrics.inc("rencontre_rest_shed_total", reason="depth")
+            raise RestShed()
+        fut = asyncio.get_running_loop().create_future()
+        self._queues[prio].append((time.perf_counter(), route, route_limit, fn, fut))
+        self._wake.set()
+        return await fut
+
+    def _pick(self):
+        for prio, q in enumerate(self._queues):
+            if prio >= REST_LOG and self._low_running >= self.low_cap:
+                break
+            for i, item in enumerate(q):
+                if i >= self.SCAN:
+                    break
+                if self._busy.get(item[1], 0) < item[2]:
+                    del q[i]
+                    return prio, item
+        return None
+
+    async def _worker(self):
+        while True:
+            picked = self._pick()
+            if picked is None:
+                if self._closing and not self.depth():
+                    return
+                self._wake.clear()  # pas d’await entre _pick et clear : aucun réveil perdu
+                await self._wake.wait()
+                continue
+            prio, (t0, route, _, fn, fut) = picked
+            if fut.done():  # appelant annulé
+                continue
+            waited = time.perf_counter() - t0
+            metrics.observe("rencontre_rest_wait_ms", waited * 1000, priority=_REST_CLASSES[prio])
+            if prio == REST_COSMETIC and waited > REST_SHED_WAIT_S:
+                metrics.inc("rencontre_rest_shed_total", reason="wait")
+                fut.set_exception(RestShed())
+                continue
+            self._busy[route] = self._busy.get(route, 0) + 1
+            low = prio >= REST_LOG
+            self._low_running += low
+            try:
+                res = await fn()
+                if not fut.done():
+                    fut.set_result(res)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            finally:
+                self._low_running -= low
+                self._busy[route] -= 1
+                if not self._busy[route]:
+                    del self._busy[route]
+                self._wake.set()
+
+rest = RestScheduler()
+
+async def channel_send(ch: discord.abc.Messageable, prio: int, content: Optional[str] = None, **kwargs) -> discord.Message:
+    """Message dans un salon / thread / DM via RestScheduler (un envoi à la fois par salon)."""
+    return await rest.call(prio, f"messages:{ch.id}", lambda: ch.send(content, **kwargs))
+
+async def send_dm(user: discord.abc.User, content: Optional[str] = None, **kwargs) -> discord.Message:
+    """DM via RestScheduler (classe dm)."""
+    async def go():
+        dm = user.dm_channel or await user.create_dm()
+        return await dm.send(content, **kwargs)
+    return await rest.call(REST_DM, f"dm:{user.id}", go)
+
 # ================================================================
 # STORAGE
 # ================================================================
-class Storage:
+# -------- Backend SQLite (STORAGE_MODE=sqlite) --------
+# Une table par collection ; les collections sans table dédiée vont dans kv.
+# Toutes les méthodes sont synchrones : Storage les appelle via run_in_executor.
+_SQL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles       (uid INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS profile_msgs   (uid INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, message_id INTEGER NOT NULL, hash TEXT);
+CREATE INDEX IF NOT EXISTS idx_profile_msgs_message ON profile_msgs(message_id);
+CREATE TABLE IF NOT EXISTS banned_users   (uid INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS owners         (uid INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS speed_sessions (session_id TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS likes          (liker INTEGER NOT NULL, target INTEGER NOT NULL, PRIMARY KEY (liker, target)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_likes_target ON likes(target);
+CREATE TABLE IF NOT EXISTS settings       (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS kv             (coll TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, PRIMARY KEY (coll, key));
+"""
+_SQL_JSON_TABLES = {"profiles": "uid", "speed_sessions": "session_id"}
+_SQL_KV_COLLS = ("dm_sessions",)  # dicts stockés clé par clé dans kv
+
+class SqliteStore:
     def __init__(self, path: str):
         self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SQL_SCHEMA)
+        cols = {row[1] for row in self.conn.execute("PRAGMA table_info(profile_msgs)")}
+        if "hash" not in cols:  # base créée avant l’empreinte des fiches
+            self.conn.execute("ALTER TABLE profile_msgs ADD COLUMN hash TEXT")
+
+    def close(self):
+        self.conn.close()
+
+    def is_empty(self) -> bool:
+        row = self.conn.execute("SELECT value FROM settings WHERE key='_migrated'").fetchone()
+        return row is None
+
+    def load_into(self, data: Dict[str, Any]):
+        c = self.conn
+        data["profiles"] = {str(uid): json.loads(v) for uid, v in c.execute("SELECT uid, data FROM profiles")}
+        data["profile_msgs"] = {
+            str(uid): {"channel_id": ch, "message_id": mid, **({"hash": h} if h else {})}
+            for uid, ch, mid, h in c.execute("SELECT uid, channel_id, message_id, hash FROM profile_msgs")
+        }
+        for coll in _ID_SETS:
+            data[coll] = [uid for (uid,) in c.execute(f"SELECT uid FROM {coll} ORDER BY uid")]
+        data["speed_sessions"] = {sid: json.loads(v) for sid, v in c.execute("SELECT session_id, data FROM speed_sessions")}
+        likes: Dict[str, List[int]] = {}
+        for liker, target in c.execute("SELECT liker, target FROM likes"):
+            likes.setdefault(str(liker), []).append(target)
+        data["likes"] = likes
+        for key, v in c.execute("SELECT key, value FROM settings WHERE key != '_migrated'"):
+            data[key] = json.loads(v)
+        for coll, key, v in c.execute("SELECT coll, key, value FROM kv"):
+            data.setdefault(coll, {})[key] = json.loads(v)
+
+    def _apply_one(self, coll: str, key: Optional[str], payload: Optional[str]):
+        c = self.conn
+        if coll in _ID_SETS and key is None:
+            c.execute(f"DELETE FROM {coll}")
+            c.executemany(f"INSERT OR IGNORE INTO {coll}(uid) VALUES (?)", [(int(u),) for u in json.loads(payload or "[]")])
+        elif coll in _ID_SETS:
+            if payload is None:
+                c.execute(f"DELETE FROM {coll} WHERE uid=?", (int(key),))
+            else:
+                c.execute(f"INSERT OR IGNORE INTO {coll}(uid) VALUES (?)", (int(key),))
+        elif coll in _EDGE_SETS and key is not None:
+            a, b = (int(x) for x in key.split(":"))
+            if payload is None:
+                c.execute(f"DELETE FROM {coll} WHERE liker=? AND target=?", (a, b))
+            else:
+                c.execute(f"INSERT OR IGNORE INTO {coll}(liker, target) VALUES (?,?)", (a, b))
+        elif coll == "profile_msgs" and key is not None:
+            if payload is None:
+                c.execute("DELETE FROM profile_msgs WHERE uid=?", (int(key),))
+            else:
+                ref = json.loads(payload)
+                c.execute(
+                    "INSERT OR REPLACE INTO profile_msgs(uid, channel_id, message_id, hash) VALUES (?,?,?,?)",
+                    (int(key), ref["channel_id"], ref["message_id"], ref.get("hash")),
+                )
+        elif coll in _SQL_JSON_TABLES and key is not None:
+            col = _SQL_JSON_TABLES[coll]
+            k = int(key) if col == "uid" else key
+            if payload is None:
+                c.execute(f"DELETE FROM {coll} WHERE {col}=?", (k,))
+            else:
+                c.execute(f"INSERT OR REPLACE INTO {coll}({col}, data) VALUES (?,?)", (k, payload))
+        elif key is None:
+            c.execute("INSERT OR REPLACE INTO settings(key, value) VALUES (?,?)", (coll, payload or "null"))
+        elif payload is None:
+            c.execute("DELETE FROM kv WHERE coll=? AND key=?", (coll, key))
+        else:
+            c.execute("INSERT OR REPLACE INTO kv(coll, key, value) VALUES (?,?,?)", (coll, key, payload))
+
+    def apply(self, changes: List[Tuple[str, Optional[str], Optional[str]]]):
+        """changes = [(collection, clé|None, json|None)] ; json=None → suppression. Une transaction."""
+        with self.conn:
+            self.conn.execute("BEGIN")
+            for coll, key, payload in changes:
+                self._apply_one(coll, key, payload)
+
+    def import_data(self, data: Dict[str, Any]):
+        """Migration one-shot depuis le JSON historique."""
+        changes: List[Tuple[str, Optional[str], Optional[str]]] = []
+        for coll, value in data.items():
+            if isinstance(value, set):
+                value = sorted(value)
+            if coll in _EDGE_SETS:
+                changes += [(coll, f"{a}:{b}", "true") for a, bs in (value or {}).items() for b in bs]
+            elif isinstance(value, dict) and (coll in _SQL_JSON_TABLES or coll in _SQL_KV_COLLS or coll == "profile_msgs"):
+                changes += [(coll, k, json.dumps(v, ensure_ascii=False)) for k, v in value.items()]
+            else:
+                changes.append((coll, None, json.dumps(value, ensure_ascii=False)))
+        changes.append(("_migrated", None, json.dumps(datetime.now(timezone.utc).isoformat())))
+        self.apply(changes)
+
+# Modes :
+#   json    → chaque mutation réécrit tout DATA_FILE (historique)
+#   journal → chaque mutation ajoute une ligne à DATA_FILE.wal ;
+#             DATA_FILE sert de snapshot, compacté en arrière-plan
+#   sqlite  → une ligne par profil/ban/session dans DB_FILE (WAL),
+#             migré une seule fois depuis DATA_FILE s’il existe
+SIDE_FILES = ("cooldowns",)  # cf. Storage.side
+
+class StorageUnavailable(Exception):
+    """Chargement des données impossible (fichier illisible, base corrompue…) ; open() pourra réessayer."""
+
+class Storage:
+    def __init__(self, path: str, mode: str = STORAGE_MODE, db_path: str = DB_FILE):
+        self.path = path
+        self.mode = mode if mode in ("json", "journal", "sqlite") else "json"
+        self.wal_path = path + ".wal"
+        self.db_path = db_path
+        self._sql: Optional[SqliteStore] = None
+        self._msg_owner: Dict[int, int] = {}  # message_id de la fiche -> uid (index inverse de profile_msgs)
+        self._liked_by: Dict[int, set] = {}   # cible -> likers (index inverse de likes)
+        # index dérivés (suggestions, recherche…) : fn(uid, profil | None) à chaque écriture
+        self.profile_listeners: List[Callable[[int, Optional[Dict[str, Any]]], None]] = []
         self._lock = asyncio.Lock()
+        self._wal_records = 0
+        self._compact_task: Optional[asyncio.Task] = None
+        # write-behind
+        self._pending: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._full_dirty = False
+        self._dirty = asyncio.Event()
+        self._closing = False
+        self._flusher: Optional[asyncio.Task] = None
+        self.stats: Dict[str, float] = {
+            "writes": 0, "coalesced": 0, "flushes": 0,
+            "last_flush_ms": 0.0, "max_flush_ms": 0.0, "total_flush_ms": 0.0,
+            "last_flush_bytes": 0, "total_flush_bytes": 0, "load_ms": 0.0,
+        }
         self.data: Dict[str, Any] = {
             "profiles": {},          # uid -> dict
             "profile_msgs": {},      # uid -> {channel_id, message_id}
-            "banned_users": [],
-            "owners": [],
+            "banned_users": set(),
+            "owners": set(),
             "welcome_panel": None,   # {channel_id, message_id}
             "like_cooldown": LIKE_COOLDOWN_DEFAULT,
             "contact_cooldown": CONTACT_COOLDOWN_DEFAULT,
             "speed_sessions": {},    # session_id -> {threads:[ids], name, started_at, delete_after}
+            "likes": {},             # liker -> set(cibles)
+            "dm_sessions": {},       # uid -> {step, answers, expires_at} (création de profil en DM)
         }
-        self.load()
+        # valeurs volumineuses et souvent réécrites (cooldowns) : un fichier JSON chacune à côté
+        # des données, remplacé d’un bloc, hors snapshot / journal / base
+        self.side: Dict[str, Any] = {}
+        # chargement différé (open) : le bot se connecte au gateway pendant la lecture
+        self.ready = asyncio.Event()
+        self.load_listeners: List[Callable[[], None]] = []
+        self._opening: Optional[asyncio.Task] = None
+
+    async def open(self):
+        """Charge les données hors boucle (une seule fois), reconstruit les index puis ouvre l’accès."""
+        if self._opening is None:
+            self._opening = asyncio.create_task(self._open())
+        await asyncio.shield(self._opening)
+
+    async def _open(self):
+        t0 = time.perf_counter()
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+        except Exception as e:
+            print(f"[STORAGE] Chargement échoué ({self.path}, {self.mode}) : {e!r}")
+            self._opening = None  # prochain open() : nouvel essai
+            if self._sql is not None:
+                self._sql.close()
+                self._sql = None
+            raise StorageUnavailable(str(e)) from e
+        for uid, prof in self.data["profiles"].items():
+            self._notify_profile(int(uid), prof)
+        for fn in self.load_listeners:
+            fn()
+        self.stats["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+        self.ready.set()
+        print(f"[STORAGE] {len(self.data['profiles'])} profils chargés en {self.stats['load_ms']} ms ({self.mode})")
 
     def load(self):
-        if os.path.exists(self.path):
+        for name in SIDE_FILES:
             try:
-                with open(self.path, "r", encoding="utf-8") as f:
-                    d = json.load(f)
-                    self.data.update(d)
-            except Exception:
+                with open(self.side_path(name), "r", encoding="utf-8") as f:
+                    self.side[name] = json.load(f)
+            except FileNotFoundError:
                 pass
+            except Exception as e:
+                print(f"[STORAGE] {self.side_path(name)} illisible, ignoré : {e}")
+        if self.mode == "sqlite":
+            self._load_sqlite()
+        elif os.path.exists(self.path):
+            # fichier illisible : on remonte l’erreur (StorageUnavailable) plutôt que de démarrer
+            # à vide — le prochain snapshot écraserait les vraies données
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.data.update(json.load(f))
+        for coll in _ID_SETS:
+            self._id_set(coll)
+        self._edge_map("likes")
+        if self.mode == "journal":
+            # wal.1 = journal en cours de compaction lors d’un crash éventuel
+            for p in (self.wal_path + ".1", self.wal_path):
+                self._replay(p)
+        self._liked_by = {}
+        for a, targets in self.data["likes"].items():
+            for b in targets:
+                self._liked_by.setdefault(b, set()).add(a)
+        self._msg_owner = {
+            int(ref["message_id"]): int(uid)
+            for uid, ref in self.data["profile_msgs"].items()
+            if isinstance(ref, dict) and ref.get("message_id")
+        }
+
+    def _id_set(self, coll: str) -> set:
+        """Convertit à la volée la liste JSON historique en set[int]."""
+        s = self.data.get(coll)
+        if not isinstance(s, set):
+            s = self.data[coll] = {int(x) for x in (s or [])}
+        return s
+
+    def _edge_map(self, coll: str) -> Dict[int, set]:
+        """{"uid": [uid, ...]} sur disque → {uid: set[uid]} en mémoire."""
+        m = self.data.get(coll)
+        if not (isinstance(m, dict) and all(isinstance(v, set) for v in m.values())):
+            m = self.data[coll] = {int(k): {int(x) for x in v} for k, v in (m or {}).items()}
+        return m
+
+    def _load_sqlite(self):
+        self._sql = SqliteStore(self.db_path)
+        if self._sql.is_empty():
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:  # illisible → pas de base importée à vide
+                    self.data.update(json.load(f))
+                print(f"[STORAGE] Migration {self.path} → {self.db_path}")
+            self._sql.import_data(self.data)
+        self._sql.load_into(self.data)
 
     async def save(self):
+        """Force un snapshot complet (json : réécriture, journal : compaction)."""
+        if self.mode == "journal":
+            await self.compact()
+        elif self.mode == "json":
+            await self._record()
+
+    # -------- Journal (write-ahead log) --------
+    def _apply(self, rec: Dict[str, Any]):
+        coll, key = rec["c"], rec.get("k")
+        if coll in _EDGE_SETS:
+            a, b = (int(x) for x in key.split(":"))
+            m = self._edge_map(coll)
+            if rec.get("d"):
+                m.get(a, set()).discard(b)
+                if not m.get(a):
+                    m.pop(a, None)
+            else:
+                m.setdefault(a, set()).add(b)
+            return
+        if coll in _ID_SETS:
+            s = self._id_set(coll)
+            if key is None:  # ancien format : liste complète
+                s.clear()
+                s.update(int(x) for x in rec.get("v") or [])
+            elif rec.get("d"):
+                s.discard(int(key))
+            else:
+                s.add(int(key))
+            return
+        if key is None:
+            self.data[coll] = rec.get("v")
+            return
+        bucket = self.data.setdefault(coll, {})
+        if rec.get("d"):
+            bucket.pop(key, None)
+        else:
+            bucket[key] = rec.get("v")
+
+    def _replay(self, path: str):
+        if not os.path.exists(path):
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue  # ligne tronquée (crash pendant l’écriture) ; la suite peut venir d’une fusion
+                self._apply(rec)
+                self._wal_records += 1
+
+    # -------- Write-behind --------
+    # Les mutations sont appliquées en mémoire tout de suite, puis marquées « sales ».
+    # Un flusher unique écrit au plus toutes les FLUSH_INTERVAL_MS, hors boucle (executor).
+    def start(self):
+        """Démarre le flusher (à appeler depuis la boucle asyncio, ex. setup_hook)."""
+        if self._flusher is None:
+            self._closing = False
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        """Arrête le flusher et écrit ce qui reste (arrêt du bot)."""
+        if self._flusher is not None:
+            self._closing = True
+            self._dirty.set()
+            await self._flusher
+            self._flusher = None
+        await self.flush()
+        if self._compact_task and not self._compact_task.done():
+            await self._compact_task
+        if self._sql is not None:  # partition déchargée : on rend la connexion
+            self._sql.close()
+            self._sql = None
+
+    async def _flush_loop(self):
+        backoff = 0.0
+        while not self._closing:
+            await self._dirty.wait()
+            if not self._closing:
+                await asyncio.sleep(FLUSH_INTERVAL_MS / 1000 + backoff)
+            self._dirty.clear()
+            try:
+                await self.flush()
+                backoff = 0.0
+            except Exception as e:
+                # lot remis en attente par flush() : nouvel essai, espacé jusqu’à 30 s
+                backoff = min(30.0, backoff * 2 or 1.0)
+                print(f"[STORAGE] Flush échoué : {e} — nouvel essai dans {backoff:.0f} s")
+                self._dirty.set()
+
+    async def _record(self, *changes: Tuple[str, Optional[str], Any]):
+        """Enregistre des mutations déjà appliquées à self.data.
+        change = (collection, clé|None, valeur) ; valeur=_DELETED → suppression."""
+        self.stats["writes"] += max(1, len(changes))
+        if self.mode == "json":
+            if self._full_dirty:
+                self.stats["coalesced"] += 1  # absorbé par le prochain snapshot complet
+        else:
+            for coll, key, value in changes:
+                k = (coll, key)
+                if k in self._pending:
+                    self.stats["coalesced"] += 1
+                    del self._pending[k]  # garde l’ordre de la dernière écriture
+                self._pending[k] = value
+        self._full_dirty = True
+        if self._flusher is None:
+            await self.flush()  # pas de flusher (script, tests) → écriture immédiate
+        else:
+            self._dirty.set()
+
+    def _snapshot(self) -> Dict[str, Any]:
+        """Copie sur deux niveaux, sérialisable hors boucle sans course avec les handlers."""
+        snap: Dict[str, Any] = {}
+        for k, v in self.data.items():
+            if k in _EDGE_SETS:
+                snap[k] = {str(a): sorted(bs) for a, bs in v.items()}
+            elif isinstance(v, dict):
+                snap[k] = {kk: (dict(vv) if isinstance(vv, dict) else vv) for kk, vv in v.items()}
+            elif isinstance(v, set):
+                snap[k] = sorted(v)
+            elif isinstance(v, list):
+                snap[k] = list(v)
+            else:
+                snap[k] = v
+        return snap
+
+    async def flush(self):
+        """Écrit les mutations en attente en une seule opération disque."""
+        if not self._full_dirty:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            self._full_dirty = False
+            t0 = time.perf_counter()
+            try:
+                size = await self._write_pending(loop, pending)
+            except Exception:
+                # écriture ratée : on remet le lot en attente (les écritures plus récentes gagnent)
+                self._pending = {**pending, **self._pending}
+                self._full_dirty = True
+                raise
+            ms = (time.perf_counter() - t0) * 1000
+            self.stats["flushes"] += 1
+            self.stats["last_flush_ms"] = round(ms, 2)
+            self.stats["max_flush_ms"] = round(max(self.stats["max_flush_ms"], ms), 2)
+            self.stats["total_flush_ms"] += ms
+            self.stats["last_flush_bytes"] = size
+            self.stats["total_flush_bytes"] += size
+            metrics.observe("rencontre_storage_flush_ms", ms, mode=self.mode)
+        if (self.mode == "journal" and self._wal_records >= JOURNAL_COMPACT_EVERY
+                and not (self._compact_task and not self._compact_task.done())):
+            self._compact_task = asyncio.create_task(self.compact())
+
+    async def _write_pending(self, loop: asyncio.AbstractEventLoop, pending: Dict[Tuple[str, Optional[str]], Any]) -> int:
+        """Écrit un lot (hors boucle) ; renvoie le nombre d’octets écrits."""
+        if self.mode == "sqlite":
+            rows = [
+                (coll, key, None if value is _DELETED else json.dumps(sorted(value) if isinstance(value, set) else value, ensure_ascii=False))
+                for (coll, key), value in pending.items()
+            ]
+            await loop.run_in_executor(None, self._sql.apply, rows)
+            return sum(len(p) for _, _, p in rows if p)
+        if self.mode == "journal":
+            lines = []
+            for (coll, key), value in pending.items():
+                rec: Dict[str, Any] = {"c": coll, "k": key}
+                if value is _DELETED:
+                    rec["d"] = 1
+                else:
+                    rec["v"] = value
+                lines.append(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            if not lines:
+                return 0
+            text = "\n".join(lines) + "\n"
+            await loop.run_in_executor(None, self._append_wal, text)
+            self._wal_records += len(lines)
+            return len(text)
+        return await loop.run_in_executor(None, self._write_snapshot, self._snapshot())
+
+    def _append_wal(self, text: str):
+        with open(self.wal_path, "a", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+
+    def _merge_wal(self, rotated: str):
+        """Ajoute le journal courant à la suite de wal.1 (ordre de rejeu conservé) puis le supprime."""
+        with open(self.wal_path, "rb") as src, open(rotated, "ab+") as dst:
+            end = dst.seek(0, os.SEEK_END)
+            if end:
+                dst.seek(end - 1)
+                if dst.read(1) != b"\n":
+                    dst.write(b"\n")  # ligne tronquée par un crash : isolée, le rejeu l’ignore
+            shutil.copyfileobj(src, dst)
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.remove(self.wal_path)
+
+    def _write_snapshot(self, snap: Dict[str, Any]) -> int:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(snap, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+        os.replace(tmp, self.path)
+        return size
+
+    async def compact(self):
+        """Réécrit le snapshot (rename atomique) et vide le journal."""
         async with self._lock:
-            with open(self.path, "w", encoding="utf-8") as f:
-                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            snap = self._snapshot()
+            rotated = self.wal_path + ".1"
+            if os.path.exists(self.wal_path):
+                if os.path.exists(rotated):
+                    # compaction précédente ratée : wal.1 n’est pas encore dans un snapshot
+                    await asyncio.get_running_loop().run_in_executor(None, self._merge_wal, rotated)
+                else:
+                    os.replace(self.wal_path, rotated)
+            self._wal_records = 0
+        try:
+            await asyncio.get_running_loop().run_in_executor(None, self._write_snapshot, snap)
+            if os.path.exists(rotated):
+                os.remove(rotated)
+        except Exception as e:
+            print(f"[STORAGE] Compaction échouée : {e}")
 
     # Profils
     def get_profile(self, uid: int) -> Optional[Dict[str, Any]]:
@@ -87,54 +847,251 @@ class Storage:
 
     async def set_profile(self, uid: int, profile: Dict[str, Any]):
         self.data["profiles"][str(uid)] = profile
-        await self.save()
+        self._notify_profile(uid, profile)
+        await self._record(("profiles", str(uid), profile))
+
+    def _notify_profile(self, uid: int, profile: Optional[Dict[str, Any]]):
+        for fn in self.profile_listeners:
+            try:
+                fn(uid, profile)
+            except Exception as e:
+                print(f"[STORAGE] Index profil en erreur : {e}")
 
     def get_profile_msg(self, uid: int) -> Optional[Dict[str, int]]:
         return self.data["profile_msgs"].get(str(uid))
 
-    def set_profile_msg(self, uid: int, ch_id: int, msg_id: int):
-        self.data["profile_msgs"][str(uid)] = {"channel_id": ch_id, "message_id": msg_id}
-        with open(self.path, "w", encoding="utf-8") as f:
-            json.dump(self.data, f, ensure_ascii=False, indent=2)
+    def owner_for_message(self, msg_id: int) -> Optional[int]:
+        return self._msg_owner.get(msg_id)
+
+    async def set_profile_msg(self, uid: int, ch_id: int, msg_id: int, content_hash: Optional[str] = None):
+        ref = {"channel_id": ch_id, "message_id": msg_id}
+        if content_hash:
+            ref["hash"] = content_hash  # empreinte de la fiche publiée (republication no-op évitée)
+        old = self.data["profile_msgs"].get(str(uid))
+        if old:
+            self._msg_owner.pop(old.get("message_id"), None)
+        self.data["profile_msgs"][str(uid)] = ref
+        self._msg_owner[msg_id] = uid
+        await self._record(("profile_msgs", str(uid), ref))
+
+    async def delete_profile_msg(self, uid: int):
+        old = self.data["profile_msgs"].pop(str(uid), None)
+        if old:
+            self._msg_owner.pop(old.get("message_id"), None)
+            await self._record(("profile_msgs", str(uid), _DELETED))
 
     async def delete_profile_data(self, uid: int):
-        self.data["profiles"].pop(str(uid), None)
-        self.data["profile_msgs"].pop(str(uid), None)
-        await self.save()
-
-    # Bans / Owners
+        await self.delete_profiles_data([uid])
+
+    async def delete_profiles_data(self, uids: List[int]) -> Dict[int, Optional[Dict[str, Any]]]:
+        """Supprime profils, fiches et likes de plusieurs membres en une seule écriture.
+        Renvoie {uid: référence de fiche | None} pour les membres qui avaient un profil ou une fiche."""
+        changes: List[Tuple[str, Optional[str], Any]] = []
+        removed: Dict[int, Optional[Dict[str, Any]]] = {}
+        for uid in dict.fromkeys(uids):
+            had_profile = self.data["profiles"].pop(str(uid), None) is not None
+            if had_profile:
+                self._notify_profile(uid, None)
+            old = self.data["profile_msgs"].pop(str(uid), None)
+            if old:
+                self._msg_owner.pop(old.get("message_id"), None)
+            if had_profile or old:
+                removed[uid] = old
+            changes += [("profiles", str(uid), _DELETED), ("profile_msgs", str(uid), _DELETED), *self._drop_likes(uid)]
+        if changes:
+            await self._record(*changes)
+        return removed
+
+    # Likes — graphe orienté liker -> cible, index inverse pour « qui m’a liké »
+    async def add_like(self, liker: int, target: int) -> bool:
+        """Enregistre le like ; renvoie True seulement s’il crée un match (like réciproque nouveau).
+        Un like déjà enregistré renvoie False : le match a été signalé la première fois."""
+        out = self.data["likes"].setdefault(liker, set())
+        if target in out:
+            return False
+        out.add(target)
+        self._liked_by.setdefault(target, set()).add(liker)
+        await self._record(("likes", f"{liker}:{target}", True))
+        return liker in self.data["likes"].get(target, ())
+
+    def likes_of(self, uid: int) -> set:
+        return self.data["likes"].get(uid, set())
+
+    def liked_by(self, uid: int) -> set:
+        return self._liked_by.get(uid, set())
+
+    def matches_of(self, uid: int) -> set:
+        return self.likes_of(uid) & self.liked_by(uid)
+
+    def like_count(self) -> int:
+        return sum(len(v) for v in self.data["likes"].values())
+
+    def _drop_likes(self, uid: int) -> List[Tuple[str, Optional[str], Any]]:
+        changes: List[Tuple[str, Optional[str], Any]] = []
+        for b in self.data["likes"].pop(uid, set()):
+            rev = self._liked_by.get(b)
+            if rev:
+                rev.discard(uid)
+                if not rev:
+                    self._liked_by.pop(b, None)
+            changes.append(("likes", f"{uid}:{b}", _DELETED))
+        for a in self._liked_by.pop(uid, set()):
+            out = self.data["likes"].get(a)
+            if out:
+                out.discard(uid)
+                if not out:
+                    self.data["likes"].pop(a, None)
+            changes.append(("likes", f"{a}:{uid}", _DELETED))
+        return changes
+
+    # Réglages / sessions
+    async def set_value(self, key: str, value: Any):
+        self.data[key] = value
+        await self._record((key, None, value))
+
+    def side_path(self, name: str) -> str:
+        return os.path.splitext(self.path)[0] + f".{name}.json"
+
+    async def set_side(self, name: str, value: Any):
+        """Remplace le fichier annexe `name` (écriture atomique hors boucle)."""
+        self.side[name] = value
+        await asyncio.get_running_loop().run_in_executor(None, self._write_side, name, value)
+
+    def _write_side(self, name: str, value: Any):
+        path = self.side_path(name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(value, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    async def set_speed_session(self, session_id: str, session: Dict[str, Any]):
+        self.data["speed_sessions"][session_id] = session
+        await self._record(("speed_sessions", session_id, session))
+
+    async def delete_speed_sessions(self, session_ids: List[str]):
+        changes = [("speed_sessions", sid, _DELETED) for sid in session_ids
+                   if self.data["speed_sessions"].pop(sid, None) is not None]
+        if changes:
+            await self._record(*changes)
+
+    # Sessions DM (création de profil)
+    def get_dm_session(self, uid: int) -> Optional[Dict[str, Any]]:
+        return self.data["dm_sessions"].get(str(uid))
+
+    async def set_dm_session(self, uid: int, session: Dict[str, Any]):
+        self.data["dm_sessions"][str(uid)] = session
+        await self._record(("dm_sessions", str(uid), session))
+
+    async def delete_dm_session(self, uid: int):
+        if self.data["dm_sessions"].pop(str(uid), None) is not None:
+            await self._record(("dm_sessions", str(uid), _DELETED))
+
+    # Bans / Owners — sets en mémoire : appartenance O(1) sur les chemins chauds
     def is_banned(self, uid: int) -> bool:
-        return uid in self.data.get("banned_users", [])
+        return uid in self.data["banned_users"]
 
     async def ban(self, uid: int):
-        if uid not in self.data["banned_users"]:
-            self.data["banned_users"].append(uid)
-            await self.save()
+        await self.ban_many([uid])
 
     async def unban(self, uid: int):
-        if uid in self.data["banned_users"]:
-            self.data["banned_users"].remove(uid)
-            await self.save()
+        await self.unban_many([uid])
+
+    async def ban_many(self, uids: List[int]) -> List[int]:
+        """Ban en masse : une seule écriture groupée. Renvoie les ids réellement ajoutés."""
+        return await self._id_set_update("banned_users", uids, add=True)
+
+    async def unban_many(self, uids: List[int]) -> List[int]:
+        return await self._id_set_update("banned_users", uids, add=False)
 
     def list_bans(self) -> List[int]:
-        return self.data.get("banned_users", [])
+        return sorted(self.data["banned_users"])
 
     def is_owner(self, uid: int) -> bool:
-        return uid in self.data.get("owners", [])
+        return uid in self.data["owners"]
 
     async def add_owner(self, uid: int):
-        if uid not in self.data["owners"]:
-            self.data["owners"].append(uid)
-            await self.save()
+        await self._id_set_update("owners", [uid], add=True)
 
     async def remove_owner(self, uid: int):
-        if uid in self.data["owners"]:
-            self.data["owners"].remove(uid)
-            await self.save()
-
-storage = Storage(DATA_FILE)
-LIKE_COOLDOWN    = int(storage.data.get("like_cooldown", LIKE_COOLDOWN_DEFAULT))
-CONTACT_COOLDOWN = int(storage.data.get("contact_cooldown", CONTACT_COOLDOWN_DEFAULT))
+        await self._id_set_update("owners", [uid], add=False)
+
+    def list_owners(self) -> List[int]:
+        return sorted(self.data["owners"])
+
+    async def _id_set_update(self, coll: str, uids: List[int], add: bool) -> List[int]:
+        s = self.data[coll]
+        changed = [u for u in dict.fromkeys(uids) if (u in s) != add]
+        if not changed:
+            return []
+        if add:
+            s.update(changed)
+        else:
+            s.difference_update(changed)
+        await self._record(*[(coll, str(u), True if add else _DELETED) for u in changed])
+        return changed
+
+# -------- Guilde courante --------
+# Chaque guilde a sa partition (Storage + index + cooldowns, cf. GuildPartitions).
+# Les points d’entrée (commandes, boutons, événements, minuteur) posent la guilde courante
+# via partitions.enter(guild_id) ; `storage`, `profile_index`… désignent alors sa partition.
+_current_guild: ContextVar[int] = ContextVar("rencontre_guild", default=GUILD_ID)
+
+class _GuildLocal:
+    """Attribut `attr` de la partition de la guilde courante."""
+    __slots__ = ("_attr",)
+
+    def __init__(self, attr: str):
+        self._attr = attr
+
+    def __getattr__(self, name: str):
+        return getattr(getattr(partitions.current(), self._attr), name)
+
+    def __len__(self) -> int:
+        return len(getattr(partitions.current(), self._attr))
+
+storage: Storage = _GuildLocal("storage")  # type: ignore[assignment]
+
+# -------- Configuration par guilde --------
+# Guilde principale : variables d’environnement ; autres guildes : /rencontre_setup.
+# Les réglages de toutes les guildes tiennent dans « guild_configs » de la partition principale
+# (quelques ids par guilde), pour savoir au démarrage quelles guildes servir sans ouvrir leurs données.
+class GuildConfig:
+    FIELDS = ("role_access", "ch_girls", "ch_boys", "ch_speed", "ch_logs", "ch_welcome")
+
+    def __init__(self, guild_id: int, role_access: int = 0, ch_girls: int = 0, ch_boys: int = 0,
+                 ch_speed: int = 0, ch_logs: int = 0, ch_welcome: int = 0):
+        self.guild_id = guild_id
+        self.role_access = role_access
+        self.ch_girls = ch_girls
+        self.ch_boys = ch_boys
+        self.ch_speed = ch_speed
+        self.ch_logs = ch_logs
+        self.ch_welcome = ch_welcome
+
+    def to_dict(self) -> Dict[str, int]:
+        return {f: getattr(self, f) for f in self.FIELDS}
+
+def guild_config(guild_id: Optional[int] = None) -> GuildConfig:
+    gid = int(guild_id or _current_guild.get())
+    if gid == GUILD_ID:
+        base = {"role_access": ROLE_ACCESS, "ch_girls": CH_GIRLS, "ch_boys": CH_BOYS,
+                "ch_speed": CH_SPEED, "ch_logs": CH_LOGS, "ch_welcome": CH_WELCOME}
+    else:
+        base = {}
+    saved = partitions.home.storage.data.get("guild_configs", {}).get(str(gid)) or {}
+    base.update({k: int(v) for k, v in saved.items() if k in GuildConfig.FIELDS})
+    return GuildConfig(gid, **base)
+
+def configured_guild_ids() -> List[int]:
+    """Guilde principale puis guildes configurées par /rencontre_setup."""
+    saved = partitions.home.storage.data.get("guild_configs", {})
+    return list(dict.fromkeys([GUILD_ID, *(int(g) for g in saved)]))
+
+async def set_guild_config(conf: GuildConfig):
+    home = partitions.home.storage
+    configs = {**home.data.get("guild_configs", {}), str(conf.guild_id): conf.to_dict()}
+    await home.set_value("guild_configs", configs)
 
 # ================================================================
 # UTILS & LOGS
@@ -142,6 +1099,95 @@ CONTACT_COOLDOWN = int(storage.data.get("contact_cooldown", CONTACT_COOLDOWN_DEF
 def now_str() -> str:
     return datetime.now(TZ).strftime("%d/%m/%Y %H:%M")
 
+def fold_text(s: str) -> str:
+    """Minuscules sans accents (« Hétéro » → « hetero »)."""
+    return "".join(c for c in unicodedata.normalize("NFKD", s) if not unicodedata.combining(c)).lower()
+
+# -------- File des logs : jusqu’à 10 embeds par message --------
+# Les logs passent après les réponses aux membres : envoi groupé, au plus un message
+# toutes les LOG_FLUSH_S par salon, et les événements mineurs sautent sous charge.
+class LogQueue:
+    MAX_EMBEDS = 10          # limite Discord par message
+    MAX_CHARS  = 6000        # limite Discord cumulée par message
+
+    def __init__(self, max_size: int = LOG_QUEUE_MAX):
+        self.max_size = max_size
+        self._items: List[Tuple[discord.TextChannel, discord.Embed]] = []
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats: Dict[str, int] = {"queued": 0, "sent_messages": 0, "sent_embeds": 0, "batched": 0, "dropped": 0, "failed": 0}
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    def depth(self) -> int:
+        return len(self._items)
+
+    async def put(self, ch: discord.TextChannel, embed: discord.Embed, low_priority: bool = False):
+        if self._task is None:  # pas de boucle de fond → envoi direct
+            await self._send(ch, [embed])
+            return
+        if low_priority and len(self._items) >= self.max_size // 2:
+            self.stats["dropped"] += 1
+            return
+        while len(self._items) >= self.max_size:  # backpressure sur les événements importants
+            self._space.clear()
+            await self._space.wait()
+        self._items.append((ch, embed))
+        self.stats["queued"] += 1
+        self._wake.set()
+
+    async def _run(self):
+        while not (self._closing and not self._items):
+            if not self._items:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if len(self._items) < self.MAX_EMBEDS and not self._closing:
+                await asyncio.sleep(LOG_FLUSH_S)  # laisse le lot se remplir
+            ch, batch = self._take_batch()
+            self._space.set()
+            await self._send(ch, batch)
+
+    def _take_batch(self) -> Tuple[discord.TextChannel, List[discord.Embed]]:
+        ch = self._items[0][0]
+        batch: List[discord.Embed] = []
+        size = 0
+        i = 0
+        while i < len(self._items) and len(batch) < self.MAX_EMBEDS:
+            c, e = self._items[i]
+            if c.id != ch.id:
+                i += 1
+                continue
+            if batch and size + len(e) > self.MAX_CHARS:
+                break
+            batch.append(e)
+            size += len(e)
+            self._items.pop(i)
+        return ch, batch
+
+    async def _send(self, ch: discord.TextChannel, batch: List[discord.Embed]):
+        try:
+            await rest.call(REST_LOG, f"messages:{ch.id}", lambda: ch.send(embeds=batch))
+            self.stats["sent_messages"] += 1
+            self.stats["sent_embeds"] += len(batch)
+            self.stats["batched"] += len(batch) - 1
+        except Exception:
+            self.stats["failed"] += len(batch)
+
+log_queue = LogQueue()
+
 async def send_log_embed(
     guild: discord.Guild,
     action: str,
@@ -149,9 +1195,10 @@ async def send_log_embed(
     user: Optional[discord.Member | discord.User] = None,
     color: Optional[int] = None
 ):
-    if not guild or not CH_LOGS:
+    ch_logs = guild_config(guild.id).ch_logs if guild else 0
+    if not ch_logs:
         return
-    ch = guild.get_channel(CH_LOGS)
+    ch = guild.get_channel(ch_logs)
     if not isinstance(ch, discord.TextChannel):
         return
     e = discord.Embed(
@@ -163,20 +1210,67 @@ async def send_log_embed(
     e.set_footer(text="Miri Rencontre • Journal des événements")
     if user:
         e.set_author(name=str(user), icon_url=user.display_avatar.url)
-    try:
-        await ch.send(embed=e)
-    except Exception:
-        pass
+    await log_queue.put(ch, e, low_priority=action in LOG_LOW_PRIORITY)
+
+class InteractionProgress:
+    """Progression d’une commande différée : édite la réponse au plus toutes les `every` s."""
+    def __init__(self, inter: discord.Interaction, label: str, total: int, every: float = 1.5):
+        self.inter = inter
+        self.label = label
+        self.total = total
+        self.every = every
+        self.count = 0
+        self._last = time.monotonic()
+
+    async def step(self, n: int = 1):
+        self.count += n
+        now = time.monotonic()
+        if now - self._last < self.every or self.count >= self.total:
+            return
+        self._last = now
+        try:
+            await self.inter.edit_original_response(content=f"{self.label}… **{self.count}/{self.total}**")
+        except Exception:
+            metrics.swallowed("progress_edit")
+
+    async def done(self, content: str):
+        try:
+            await self.inter.edit_original_response(content=content)
+        except Exception:
+            try:
+                await self.inter.followup.send(content, ephemeral=True)
+            except Exception:
+                metrics.swallowed("progress_done")
+
+async def for_each_bounded(items: List[Any], fn, limit: int = SPEED_CONCURRENCY, progress: Optional[InteractionProgress] = None) -> int:
+    """Applique la coroutine fn à chaque élément, au plus `limit` à la fois. Renvoie le nombre de succès."""
+    sem = asyncio.Semaphore(limit)
+
+    async def one(item) -> bool:
+        async with sem:
+            try:
+                await fn(item)
+                return True
+            except Exception:
+                metrics.swallowed("bounded_task")
+                return False
+            finally:
+                if progress:
+                    await progress.step()
+
+    return sum(await asyncio.gather(*(one(i) for i in items)))
 
 async def _remove_access_role(guild: discord.Guild, member: Optional[discord.Member]):
-    if not (guild and member and ROLE_ACCESS):
+    role_id = guild_config(guild.id).role_access if guild else 0
+    if not (member and role_id):
         return
-    role = guild.get_role(ROLE_ACCESS)
+    role = guild.get_role(role_id)
     if role and role in member.roles:
         try:
-            await member.remove_roles(role, reason="Suppression du profil Rencontre")
+            await rest.call(REST_MODERATION, f"roles:{guild.id}",
+                            lambda: member.remove_roles(role, reason="Suppression du profil Rencontre"))
         except Exception:
-            pass
+            metrics.swallowed("remove_role")
 
 async def full_profile_reset(
     guild: discord.Guild,
@@ -190,15 +1284,131 @@ async def full_profile_reset(
         ch = guild.get_channel(ref["channel_id"])
         if isinstance(ch, discord.TextChannel):
             try:
-                msg = await ch.fetch_message(ref["message_id"])
-                await msg.delete()
+                # suppression directe par id : pas de GET préalable
+                await rest.call(REST_MODERATION, f"delete:{ch.id}", ch.get_partial_message(ref["message_id"]).delete)
             except Exception:
-                pass
+                metrics.swallowed("profile_reset_card")
     member = guild.get_member(uid)
     await _remove_access_role(guild, member)
     if do_log:
         await send_log_embed(guild, "Profil supprimé", f"Profil supprimé ({reason})", member, 0xF43F5E)
 
+# -------- Départs groupés (prune, nettoyage après raid…) --------
+# on_member_remove ne fait que mettre le membre en file ; chaque lot (par guilde) fait
+# une seule écriture Storage, des bulk delete par salon et un log récapitulatif.
+BULK_DELETE_MAX_AGE_S = 14 * 86400 - 600  # Discord refuse le bulk delete au-delà de 14 jours
+
+async def delete_messages_grouped(ch: discord.TextChannel, message_ids: List[int], limit: int = SPEED_CONCURRENCY) -> int:
+    """Supprime des messages par paquets de 100 (bulk delete), un par un s’ils sont trop anciens.
+    Renvoie le nombre de messages supprimés."""
+    cutoff = time.time() - BULK_DELETE_MAX_AGE_S
+    recent = [m for m in message_ids if discord.utils.snowflake_time(m).timestamp() > cutoff]
+    single = [m for m in message_ids if discord.utils.snowflake_time(m).timestamp() <= cutoff]
+    n = 0
+    for i in range(0, len(recent), 100):
+        chunk = recent[i:i + 100]
+        try:
+            await rest.call(REST_MODERATION, f"bulk-delete:{ch.id}", lambda: ch.delete_messages([discord.Object(id=m) for m in chunk]))
+            n += len(chunk)
+        except Exception:
+            single += chunk  # permission manquante, message déjà supprimé… → un par un
+    n += await for_each_bounded(
+        single,
+        lambda m: rest.call(REST_MODERATION, f"delete:{ch.id}", ch.get_partial_message(m).delete, route_limit=limit),
+        limit,
+    )
+    return n
+
+async def delete_profile_cards(guild: discord.Guild, removed: Dict[int, Optional[Dict[str, Any]]], limit: int = SPEED_CONCURRENCY) -> int:
+    """Retire les fiches renvoyées par Storage.delete_profiles_data, regroupées par salon. Renvoie le nombre de fiches supprimées."""
+    by_channel: Dict[int, List[int]] = {}
+    for ref in removed.values():
+        if ref:
+            by_channel.setdefault(int(ref["channel_id"]), []).append(int(ref["message_id"]))
+    n = 0
+    for ch_id, mids in by_channel.items():
+        ch = guild.get_channel(ch_id)
+        if isinstance(ch, discord.TextChannel):
+            n += await delete_messages_grouped(ch, mids, limit)
+    return n
+
+class DepartureQueue:
+    def __init__(self, window_s: float = DEPARTURE_FLUSH_S, max_batch: int = DEPARTURE_BATCH_MAX):
+        self.window_s = window_s
+        self.max_batch = max_batch
+        self._pending: Dict[int, Dict[int, str]] = {}   # guild_id -> {uid: nom}
+        self._guilds: Dict[int, discord.Guild] = {}
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.stats: Dict[str, int] = {"queued": 0, "batches": 0, "profiles": 0, "cards": 0}
+
+    def start(self):
+        if self._task is None:
+            self._closing = False
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+
+    def depth(self) -> int:
+        return sum(len(v) for v in self._pending.values())
+
+    async def put(self, member: discord.Member):
+        if self._task is None:  # pas de boucle de fond → traitement direct
+            await self._process(member.guild, {member.id: str(member)})
+            return
+        self._guilds[member.guild.id] = member.guild
+        self._pending.setdefault(member.guild.id, {})[member.id] = str(member)
+        self.stats["queued"] += 1
+        self._wake.set()
+
+    async def _run(self):
+        while not (self._closing and not self._pending):
+            if not self._pending:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            if not self._closing:
+                await asyncio.sleep(self.window_s)  # laisse la vague de départs s’accumuler
+            gid = next(iter(self._pending))
+            members = self._pending[gid]
+            batch = dict(list(members.items())[:self.max_batch])
+            for uid in batch:
+                del members[uid]
+            if not members:
+                del self._pending[gid]
+            try:
+                await self._process(self._guilds[gid], batch)
+            except Exception as e:
+                print(f"[DEPARTS] Lot de {len(batch)} départ(s) échoué ({gid}) : {e}")
+
+    async def _process(self, guild: discord.Guild, members: Dict[int, str]):
+        await partitions.enter(guild.id)
+        removed = await storage.delete_profiles_data(list(members))
+        cards = await delete_profile_cards(guild, removed)
+        self.stats["batches"] += 1
+        self.stats["profiles"] += len(removed)
+        self.stats["cards"] += cards
+        metrics.inc("rencontre_departures_total", len(members))
+        if not removed:
+            return  # aucun profil concerné : rien à signaler
+        names = ", ".join(members[u] for u in list(removed)[:15])
+        more = f" (+{len(removed) - 15})" if len(removed) > 15 else ""
+        await send_log_embed(
+            guild,
+            "Départs du serveur",
+            f"👋 {len(members)} départ(s) — **{len(removed)}** profil(s) supprimé(s), **{cards}** fiche(s) retirée(s)\n{names}{more}",
+            None,
+            0xF43F5E,
+        )
+
+departure_queue = DepartureQueue()
+
 def parse_duration_to_seconds(s: str) -> int:
     s = (s or "").strip().lower().replace(" ", "")
     if not s:
@@ -213,6 +1423,232 @@ def parse_duration_to_seconds(s: str) -> int:
         return max(60, int(m2.group(1)) * 60)
     return 5 * 60
 
+# ================================================================
+# INDEX PROFILS (suggestions, recherche)
+# ================================================================
+_GENRE_BIT = {"Femme": 1, "Homme": 2}
+_STOP_WORDS = {"les", "des", "une", "et", "de", "la", "le", "du", "en", "au", "aux", "avec", "pour", "mes", "sur", "dans", "tout", "plus"}
+
+def profile_attraction(prof: Dict[str, Any]) -> frozenset:
+    """Genres recherchés d’après le champ libre « attirance »."""
+    genre = prof.get("genre")
+    other = "Homme" if genre == "Femme" else "Femme"
+    o = fold_text(prof.get("orientation") or "")
+    # homo d’abord : « lesbienne » contient « bi »
+    if any(w in o for w in ("homo", "gay", "lesbi")):
+        return frozenset((genre,)) if genre else frozenset(("Femme", "Homme"))
+    if re.search(r"\bbi\b|bisex|\bpan", o) or "tous" in o or "peu importe" in o:
+        return frozenset(("Femme", "Homme"))
+    if "hetero" in o:
+        return frozenset((other,))
+    return frozenset(("Femme", "Homme"))
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in re.split(r"[^0-9a-z]+", fold_text(text or "")) if len(t) > 2 and t not in _STOP_WORDS]
+
+class ProfileIndex:
+    """Colonnes array (une ligne par profil), seaux (genre, tranche d’âge de 5 ans) et
+    passions converties en ids entiers. Mis à jour à chaque écriture de profil.
+    Le score se calcule ligne par ligne en Python (intersections de frozensets), limité
+    aux seaux compatibles : pas de calcul vectoriel, numpy n’est pas une dépendance."""
+    AGE_WINDOW = 8          # écart d’âge max considéré
+    BUCKET = 5
+    CACHE_SIZE = 1000
+    CACHE_DEPTH = 40        # candidats gardés en cache par profil (exclusions filtrées à la lecture)
+
+    def __init__(self):
+        self.uid = array("q")
+        self.age = array("h")
+        self.genre = array("b")   # bit genre (0 = inconnu)
+        self.seeks = array("b")   # bits des genres recherchés
+        self.tokens: List[frozenset] = []
+        self.row: Dict[int, int] = {}
+        self.free: List[int] = []
+        self.buckets: Dict[Tuple[int, int], set] = {}
+        self.vocab: Dict[str, int] = {}
+        self._words: Dict[int, str] = {}
+        # version par seau : une entrée de cache ne dépend que des seaux qu’elle a parcourus
+        self.bucket_version: Dict[Tuple[int, int], int] = {}
+        self._cache: "OrderedDict[int, Tuple[Tuple[Tuple[Tuple[int, int], int], ...], bool, List[Tuple[int, float, List[int]]]]]" = OrderedDict()
+
+    def _token_ids(self, text: str) -> frozenset:
+        ids = set()
+        for t in tokenize(text):
+            i = self.vocab.get(t)
+            if i is None:
+                i = self.vocab[t] = len(self.vocab)
+            ids.add(i)
+        return frozenset(ids)
+
+    def _bucket_key(self, r: int) -> Tuple[int, int]:
+        return (self.genre[r], self.age[r] // self.BUCKET)
+
+    def _touch(self, key: Tuple[int, int]):
+        self.bucket_version[key] = self.bucket_version.get(key, 0) + 1
+
+    def upsert(self, uid: int, prof: Optional[Dict[str, Any]]):
+        """Écouteur Storage : prof=None → suppression."""
+        r = self.row.get(uid)
+        if r is not None:
+            self.buckets.get(self._bucket_key(r), set()).discard(r)
+            self._touch(self._bucket_key(r))
+        if prof is None:
+            if r is not None:
+                del self.row[uid]
+                self.uid[r] = 0
+                self.tokens[r] = frozenset()
+                self.free.append(r)
+            return
+        try:
+            age = max(0, min(int(prof.get("age") or 0), 150))
+        except (TypeError, ValueError):
+            age = 0
+        genre = _GENRE_BIT.get(prof.get("genre"), 0)
+        seeks = 0
+        for g in profile_attraction(prof):
+            seeks |= _GENRE_BIT.get(g, 0)
+        toks = self._token_ids(prof.get("passions") or "")
+        if r is None:
+            if self.free:
+                r = self.free.pop()
+            else:
+                r = len(self.uid)
+                self.uid.append(0); self.age.append(0); self.genre.append(0); self.seeks.append(0)
+                self.tokens.append(frozenset())
+            self.row[uid] = r
+        self.uid[r], self.age[r], self.genre[r], self.seeks[r], self.tokens[r] = uid, age, genre, seeks, toks
+        self.buckets.setdefault(self._bucket_key(r), set()).add(r)
+        self._touch(self._bucket_key(r))
+
+    def suggest(self, uid: int, k: int = 5, exclude: Optional[set] = None) -> List[Tuple[int, float, List[int]]]:
+        """Top-k [(uid, score, ids de passions communes)]. Le classement reste en cache tant que les seaux
+        parcourus (et celui du profil) n’ont pas changé ; les exclusions sont filtrées à la lecture."""
+        exclude = exclude or set()
+        r = self.row.get(uid)
+        if r is None:
+            return []
+        age, seeks = self.age[r], self.seeks[r]
+        lo, hi = (age - self.AGE_WINDOW) // self.BUCKET, (age + self.AGE_WINDOW) // self.BUCKET
+        scan = [(g, b) for g in (1, 2, 0) if not g or seeks & g for b in range(lo, hi + 1)]
+        deps = tuple((key, self.bucket_version.get(key, 0)) for key in [self._bucket_key(r)] + scan)
+        hit = self._cache.get(uid)
+        if hit and hit[0] == deps:
+            self._cache.move_to_end(uid)
+            _, complete, ranked = hit
+        else:
+            ranked = self._rank(r, scan, self.CACHE_DEPTH)
+            complete = len(ranked) < self.CACHE_DEPTH
+            self._cache[uid] = (deps, complete, ranked)
+            self._cache.move_to_end(uid)
+            while len(self._cache) > self.CACHE_SIZE:
+                self._cache.popitem(last=False)
+        out = [x for x in ranked if x[0] not in exclude][:k]
+        if len(out) < k and not complete:
+            # trop d’exclusions pour la profondeur du cache : classement complet, hors cache
+            out = [x for x in self._rank(r, scan, k + len(exclude)) if x[0] not in exclude][:k]
+        return out
+
+    def _rank(self, r: int, scan: List[Tuple[int, int]], n: int) -> List[Tuple[int, float, List[int]]]:
+        age, genre, toks = self.age[r], self.genre[r], self.tokens[r]
+        win = self.AGE_WINDOW
+        scored: List[Tuple[float, int]] = []
+        for key in scan:
+            for c in self.buckets.get(key, ()):
+                if c == r:
+                    continue
+                # compatibilité mutuelle (genre inconnu = ouvert)
+                if genre and not (self.seeks[c] & genre):
+                    continue
+                d = abs(self.age[c] - age)
+                if d > win:
+                    continue
+                other = self.tokens[c]
+                union = len(toks | other)
+                jacc = len(toks & other) / union if union else 0.0
+                scored.append((0.4 * (1 - d / (win + 1)) + 0.6 * jacc, c))
+        return [(self.uid[c], round(s, 3), sorted(toks & self.tokens[c])) for s, c in heapq.nlargest(n, scored)]
+
+    def words(self, ids: List[int]) -> List[str]:
+        if len(self._words) != len(self.vocab):
+            self._words = {i: t for t, i in self.vocab.items()}
+        return [self._words[i] for i in ids if i in self._words]
+
+profile_index: ProfileIndex = _GuildLocal("profile_index")  # type: ignore[assignment]
+
+class SearchIndex:
+    """Index inversé (terme replié → uids) sur passions / activité / attirance.
+    Les termes sont aussi tenus triés : une recherche « rando » couvre « randonnee »
+    par bisection sur le vocabulaire plutôt que par un parcours complet. Le filtre
+    genre et le classement se font par intersections d’ensembles."""
+    FIELDS = ("passions", "activite", "orientation")
+    PAGE_SIZE = 10
+
+    def __init__(self):
+        self.postings: Dict[str, set] = {}
+        self.terms: List[str] = []           # vocabulaire trié (recherche par préfixe)
+        self.docs: Dict[int, frozenset] = {}  # uid -> termes
+        self.ages: Dict[int, int] = {}
+        self.by_genre: Dict[str, set] = {}
+
+    def upsert(self, uid: int, prof: Optional[Dict[str, Any]]):
+        """Écouteur Storage : prof=None → suppression."""
+        for t in self.docs.pop(uid, ()):
+            ids = self.postings.get(t)
+            if ids is None:
+                continue
+            ids.discard(uid)
+            if not ids:
+                del self.postings[t]
+                i = bisect_left(self.terms, t)
+                if i < len(self.terms) and self.terms[i] == t:
+                    self.terms.pop(i)
+        self.ages.pop(uid, None)
+        for ids in self.by_genre.values():
+            ids.discard(uid)
+        if prof is None:
+            return
+        terms = frozenset(t for k in self.FIELDS for t in tokenize(prof.get(k) or ""))
+        for t in terms:
+            ids = self.postings.get(t)
+            if ids is None:
+                ids = self.postings[t] = set()
+                insort(self.terms, t)
+            ids.add(uid)
+        self.docs[uid] = terms
+        try:
+            self.ages[uid] = int(prof.get("age") or 0)
+        except (TypeError, ValueError):
+            self.ages[uid] = 0
+        if prof.get("genre"):
+            self.by_genre.setdefault(prof["genre"], set()).add(uid)
+
+    def _prefix(self, p: str) -> set:
+        i = bisect_left(self.terms, p)
+        j = bisect_left(self.terms, p + "\uffff", i)
+        if j - i == 1:
+            return self.postings[self.terms[i]]
+        return set().union(*(self.postings[t] for t in self.terms[i:j]))
+
+    def search(self, query: str, age_min: int = 0, age_max: int = 200,
+               genre: Optional[str] = None) -> List[int]:
+        """Uids dont le profil contient tous les mots de la requête (préfixes acceptés) :
+        d’abord ceux où tous les mots figurent tels quels, puis les autres, par uid."""
+        words = list(dict.fromkeys(tokenize(query)))  # même découpage que l’index (mots courts / vides ignorés)
+        if not words:
+            return []
+        hits = sorted((self._prefix(w) for w in words), key=len)
+        if genre:
+            hits.insert(0, self.by_genre.get(genre, set()))
+        found = hits[0].intersection(*hits[1:])
+        if not found:
+            return []
+        ages = self.ages
+        found = {u for u in found if age_min <= ages[u] <= age_max}
+        exact = found.intersection(*(self.postings.get(w, ()) for w in words))
+        return sorted(exact) + sorted(found - exact)
+
+search_index: SearchIndex = _GuildLocal("search_index")  # type: ignore[assignment]
+
 # ================================================================
 # EMBEDS / VIEWS
 # ================================================================
@@ -235,30 +1671,619 @@ def build_profile_embed(member: discord.Member, prof: Dict[str, Any]) -> discord
 
 def target_channel_for(guild: discord.Guild, prof: Dict[str, Any]) -> Optional[discord.TextChannel]:
     gender = (prof.get("genre") or "").strip().lower()
-    return guild.get_channel(CH_GIRLS) if gender.startswith("f") else guild.get_channel(CH_BOYS)
-
-async def publish_or_update_profile(guild: discord.Guild, member: discord.Member, prof: Dict[str, Any]):
-    embed = build_profile_embed(member, prof)
-    view = ProfileView(owner_id=member.id)
-    ref = storage.get_profile_msg(member.id)
+    conf = guild_config(guild.id)
+    return guild.get_channel(conf.ch_girls) if gender.startswith("f") else guild.get_channel(conf.ch_boys)
+
+def profile_card_hash(member: discord.Member, prof: Dict[str, Any]) -> str:
+    """Empreinte du contenu affiché par build_profile_embed (hors horodatage)."""
+    shown = [member.display_name] + [prof.get(k) for k in ("age", "genre", "orientation", "passions", "activite", "photo_url")]
+    return hashlib.sha1(json.dumps(shown, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()[:16]
+
+async def publish_or_update_profile(guild: discord.Guild, member: discord.Member, prof: Dict[str, Any], force: bool = False) -> Optional[str]:
+    """Publie ou met à jour la fiche. Renvoie "unchanged", "edited", "posted" ou None (salon introuvable).
+    force=True : nouvelle fiche sans regarder la référence enregistrée (remplacée seulement si l’envoi réussit)."""
+    digest = profile_card_hash(member, prof)
+    target = target_channel_for(guild, prof)
+    ref = None if force else storage.get_profile_msg(member.id)
     if ref:
         ch = guild.get_channel(ref["channel_id"])
+        same_channel = isinstance(target, discord.TextChannel) and ref["channel_id"] == target.id
+        if same_channel and ref.get("hash") == digest:
+            return "unchanged"
         if isinstance(ch, discord.TextChannel):
+            partial = ch.get_partial_message(ref["message_id"])
             try:
-                msg = await ch.fetch_message(ref["message_id"])
-                await msg.edit(embed=embed, view=view)
-                return
+                if same_channel:
+                    # édition directe par id : pas de fetch_message préalable
+                    await rest.call(REST_MODERATION, f"messages:{ch.id}", lambda: partial.edit(
+                        embed=build_profile_embed(member, prof), view=ProfileView(owner_id=member.id)))
+                    await storage.set_profile_msg(member.id, ch.id, ref["message_id"], digest)
+                    return "edited"
+                await rest.call(REST_MODERATION, f"delete:{ch.id}", partial.delete)  # le genre a changé : la fiche change de salon
+            except discord.NotFound:
+                pass  # fiche supprimée à la main → republication
             except Exception:
-                pass
-    ch = target_channel_for(guild, prof)
-    if not isinstance(ch, discord.TextChannel):
-        return
-    msg = await ch.send(embed=embed, view=view)
-    storage.set_profile_msg(member.id, ch.id, msg.id)
+                if same_channel:
+                    return None
+    if not isinstance(target, discord.TextChannel):
+        return None
+    msg = await channel_send(target, REST_MODERATION, embed=build_profile_embed(member, prof), view=ProfileView(owner_id=member.id))
+    await storage.set_profile_msg(member.id, target.id, msg.id, digest)
+    return "posted"
+
+# -------- Réconciliation des fiches (après panne / suppressions à la main) --------
+def _is_profile_card(msg: discord.Message, bot_id: int) -> bool:
+    if msg.author.id != bot_id:
+        return False
+    for row in msg.components:
+        for comp in getattr(row, "children", []):
+            if getattr(comp, "custom_id", None) == "profile_like":
+                return True
+    return False
+
+async def reconcile_profile_cards(
+    guild: discord.Guild,
+    dry_run: bool = False,
+    progress: Optional[InteractionProgress] = None,
+) -> Dict[str, int]:
+    """Parcourt une fois l’historique des salons filles/garçons, supprime les fiches orphelines
+    ou en double (bulk delete par 100) et republie les fiches manquantes."""
+    stats = {"scanned": 0, "kept": 0, "orphans": 0, "duplicates": 0, "deleted": 0, "reposted": 0, "no_member": 0, "failed": 0}
+    bot_id = guild.me.id
+    profile_names = set()
+    for uid in storage.data["profiles"]:
+        member = guild.get_member(int(uid))
+        if member:
+            profile_names.add(member.display_name)
+    seen: set = set()
+    doomed: Dict[int, List[discord.Message]] = {}
+    # références d’avant le parcours : une fiche (re)publiée entre-temps n’est ni supprimée ni republiée
+    refs_before = dict(storage.data["profile_msgs"])
+    conf = guild_config(guild.id)
+    for ch_id in dict.fromkeys((conf.ch_girls, conf.ch_boys)):
+        ch = guild.get_channel(ch_id)
+        if not isinstance(ch, discord.TextChannel):
+            continue
+        async for msg in ch.history(limit=None):
+            if not _is_profile_card(msg, bot_id):
+                continue
+            stats["scanned"] += 1
+            uid = storage.owner_for_message(msg.id)
+            ref = storage.get_profile_msg(uid) if uid else None
+            if uid and storage.get_profile(uid) and ref and ref["channel_id"] == ch.id and msg.id not in seen:
+                seen.add(msg.id)
+                stats["kept"] += 1
+                continue
+            # doublon = autre fiche d’un membre qui a déjà un profil (titre = pseudo)
+            title = msg.embeds[0].title if msg.embeds else None
+            stats["duplicates" if title in profile_names else "orphans"] += 1
+            doomed.setdefault(ch.id, []).append(msg)
+        if progress:
+            await progress.step()
+
+    def unchanged(uid: int) -> bool:
+        return storage.get_profile_msg(uid) == refs_before.get(str(uid))
+
+    missing = [
+        int(uid) for uid in storage.data["profiles"]
+        if (storage.get_profile_msg(int(uid)) or {}).get("message_id") not in seen and unchanged(int(uid))
+    ]
+    if dry_run:
+        stats["reposted"] = len(missing)
+        return stats
+
+    def still_doomed(msg: discord.Message) -> bool:
+        uid = storage.owner_for_message(msg.id)
+        return not (uid and (storage.get_profile_msg(uid) or {}).get("message_id") == msg.id)
+
+    # bulk delete par 100 (moins de 14 jours), un par un sinon — via le planificateur REST
+    for ch_id, msgs in doomed.items():
+        ids = [m.id for m in msgs if still_doomed(m)]
+        n = await delete_messages_grouped(guild.get_channel(ch_id), ids, RECONCILE_CONCURRENCY)
+        stats["deleted"] += n
+        stats["failed"] += len(ids) - n
+
+    async def repost(uid: int):
+        member = guild.get_member(uid)
+        if not member:
+            stats["no_member"] += 1
+            return
+        if not unchanged(uid):
+            return  # fiche republiée pendant la réconciliation
+        # référence périmée : republication forcée, remplacée seulement si l’envoi réussit
+        if await publish_or_update_profile(guild, member, storage.get_profile(uid), force=True) == "posted":
+            stats["reposted"] += 1
+        else:
+            stats["failed"] += 1
+
+    await for_each_bounded(missing, repost, RECONCILE_CONCURRENCY)
+    return stats
+
+def reconcile_summary(stats: Dict[str, int]) -> str:
+    return (
+        f"• Fiches analysées : **{stats['scanned']}** (conservées : **{stats['kept']}**)\n"
+        f"• Orphelines : **{stats['orphans']}** — doublons : **{stats['duplicates']}** — supprimées : **{stats['deleted']}**\n"
+        f"• Republiées : **{stats['reposted']}** — membres absents : **{stats['no_member']}** — échecs : **{stats['failed']}**"
+    )
+
+# -------- Profils orphelins (membres partis pendant que le bot était hors ligne) --------
+# Une différence d’ensembles contre le cache des membres, puis suppression par petits lots
+# espacés qui attendent que les handlers interactifs (metrics.inflight) soient terminés.
+def find_orphans(guild: discord.Guild) -> Dict[str, List[int]]:
+    present = {m.id for m in guild.members}
+    owners = {int(u) for u in storage.data["profiles"]} | {int(u) for u in storage.data["profile_msgs"]}
+    return {
+        "profiles": sorted(owners - present),
+        "banned": sorted(storage.data["banned_users"] - present),
+    }
+
+async def sweep_orphans(
+    guild: discord.Guild,
+    dry_run: bool = False,
+    progress: Optional[InteractionProgress] = None,
+) -> Dict[str, int]:
+    """Supprime profils, fiches et likes des membres absents de la guilde.
+    Les bans sont seulement comptés : ils doivent survivre à un départ puis un retour."""
+    stats = {"members": guild.member_count or len(guild.members), "orphans": 0, "removed": 0, "cards": 0, "banned_absent": 0, "skipped": 0}
+    if not guild.chunked:
+        stats["skipped"] = 1  # cache des membres incomplet : tout le monde semblerait parti
+        return stats
+    found = find_orphans(guild)
+    stats["orphans"] = len(found["profiles"])
+    stats["banned_absent"] = len(found["banned"])
+    if progress:
+        progress.total = max(1, stats["orphans"])
+    if dry_run:
+        return stats
+    for i in range(0, len(found["profiles"]), SWEEP_BATCH):
+        # priorité aux interactions en cours, mais bornée : un trafic continu ne bloque pas le balayage
+        deadline = time.monotonic() + SWEEP_MAX_WAIT_S
+        while metrics.inflight and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+        batch = [u for u in found["profiles"][i:i + SWEEP_BATCH] if guild.get_member(u) is None]
+        removed = await storage.delete_profiles_data(batch)
+        stats["removed"] += len(removed)
+        stats["cards"] += await delete_profile_cards(guild, removed, limit=1)
+        if progress:
+            await progress.step(len(batch))
+        await asyncio.sleep(SWEEP_PAUSE_S)
+    return stats
+
+def sweep_summary(stats: Dict[str, int]) -> str:
+    if stats["skipped"]:
+        return "• Cache des membres incomplet : balayage ignoré"
+    return (
+        f"• Membres : **{stats['members']}** — profils orphelins : **{stats['orphans']}**\n"
+        f"• Supprimés : **{stats['removed']}** — fiches retirées : **{stats['cards']}**\n"
+        f"• Bannis absents du serveur (conservés) : **{stats['banned_absent']}**"
+    )
+
+async def orphan_sweeper(bot: commands.Bot):
+    await bot.wait_until_ready()
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL_S)
+        for part in partitions.loaded():
+            guild = bot.get_guild(part.guild_id)
+            if not guild:
+                continue
+            try:
+                await partitions.enter(part.guild_id)
+                stats = await sweep_orphans(guild)
+                if stats["removed"]:
+                    print(f"[SWEEP] {part.guild_id} : {stats}")
+                    await send_log_embed(guild, "Balayage des profils orphelins", sweep_summary(stats), None, 0x7DD3FC)
+            except Exception as e:
+                print(f"[SWEEP FAIL] {part.guild_id} : {e}")
+
+# Cooldowns — (user_id, owner_id) -> instant du dernier clic.
+# Les clics arrivent dans l’ordre du temps : l’OrderedDict (move_to_end) reste trié
+# par ancienneté, donc l’expiration et l’éviction se font en tête, en O(1) amorti.
+class CooldownStore:
+    def __init__(self, store: Storage, name: str, setting: str, default: int, max_entries: int = COOLDOWN_MAX_ENTRIES):
+        self.store = store
+        self.name = name
+        self.setting = setting
+        self.default = default
+        self.max_entries = max_entries
+        self._hits: "OrderedDict[Tuple[int, int], float]" = OrderedDict()
+        self.version = 0
+        self.saved_version = 0
+
+    def ttl(self) -> int:
+        return int(self.store.data.get(self.setting, self.default))
+
+    def hit(self, user_id: int, owner_id: int) -> bool:
+        """True si l’action est autorisée (et démarre le cooldown), False sinon."""
+        key = (user_id, owner_id)
+        now = time.time()
+        last = self._hits.get(key)
+        if last is not None and now - last < self.ttl():
+            return False
+        self._hits[key] = now
+        self._hits.move_to_end(key)
+        while len(self._hits) > self.max_entries:
+            self._hits.popitem(last=False)
+        self.version += 1
+        self.sweep(now)
+        return True
+
+    def sweep(self, now: Optional[float] = None) -> int:
+        now = now or time.time()
+        ttl = self.ttl()
+        n = 0
+        while self._hits:
+            key, t = next(iter(self._hits.items()))
+            if now - t < ttl:
+                break
+            self._hits.popitem(last=False)
+            n += 1
+        return n
+
+    def __len__(self) -> int:
+        return len(self._hits)
+
+    def dump(self) -> List[List[float]]:
+        return [[u, o, round(t, 1)] for (u, o), t in self._hits.items()]
+
+    def restore(self, rows: List[List[float]]):
+        for u, o, t in sorted(rows or [], key=lambda r: r[2]):
+            self._hits[(int(u), int(o))] = float(t)
+        self.sweep()
+        while len(self._hits) > self.max_entries:  # snapshot pris avec un plafond plus haut
+            self._hits.popitem(last=False)
+
+# -------- Activité : compteurs pré-agrégés en anneaux --------
+# Par type d’événement : 168 tranches horaires (7 j) + 60 journalières (heure de Paris),
+# array("I") de ~1 Ko. Une tranche est remise à zéro quand l’anneau la réutilise :
+# les tendances 24 h / 7 j / 30 j et les heures de pointe se lisent sans parcourir d’historique.
+ACTIVITY_KINDS = ("like", "pass", "contact", "match", "onboarding")
+
+class ActivityRing:
+    HOURS = 168
+    DAYS = 60
+
+    def __init__(self):
+        self.hours = array("I", [0]) * self.HOURS
+        self.days = array("I", [0]) * self.DAYS
+        self.hour = 0  # heure epoch (UTC) de la tranche horaire courante
+        self.day = 0   # jour (ordinal, heure de Paris) de la tranche journalière courante
+
+    def _advance(self, now: float):
+        hour, day = int(now // 3600), datetime.fromtimestamp(now, TZ).toordinal()
+        if hour > self.hour:
+            for h in range(max(self.hour + 1, hour - self.HOURS + 1), hour + 1):
+                self.hours[h % self.HOURS] = 0
+            self.hour = hour
+        if day > self.day:
+            for d in range(max(self.day + 1, day - self.DAYS + 1), day + 1):
+                self.days[d % self.DAYS] = 0
+            self.day = day
+
+    def add(self, now: float, n: int = 1):
+        self._advance(now)
+        self.hours[self.hour % self.HOURS] += n
+        self.days[self.day % self.DAYS] += n
+
+    def last_hours(self, n: int, offset: int = 0, now: Optional[float] = None) -> int:
+        """Total des n dernières heures (l’heure en cours comprise), décalé de offset heures."""
+        self._advance(now or time.time())
+        return sum(self.hours[(self.hour - offset - i) % self.HOURS] for i in range(min(n, self.HOURS - offset)))
+
+    def last_days(self, n: int, offset: int = 0, now: Optional[float] = None) -> int:
+        self._advance(now or time.time())
+        return sum(self.days[(self.day - offset - i) % self.DAYS] for i in range(min(n, self.DAYS - offset)))
+
+    def daily(self, n: int, now: Optional[float] = None) -> List[int]:
+        """Les n derniers jours, du plus ancien au plus récent."""
+        self._advance(now or time.time())
+        return [self.days[(self.day - i) % self.DAYS] for i in range(n - 1, -1, -1)]
+
+    def by_hour_of_day(self, now: Optional[float] = None) -> List[int]:
+        """Total par heure locale (0–23) sur les 7 derniers jours."""
+        self._advance(now or time.time())
+        out = [0] * 24
+        for i in range(self.HOURS):
+            h = self.hour - i
+            out[datetime.fromtimestamp(h * 3600, TZ).hour] += self.hours[h % self.HOURS]
+        return out
+
+    def dump(self) -> Dict[str, Any]:
+        return {"hour": self.hour, "day": self.day, "hours": self.hours.tolist(), "days": self.days.tolist()}
+
+    def restore(self, d: Dict[str, Any]):
+        if len(d.get("hours", ())) == self.HOURS and len(d.get("days", ())) == self.DAYS:
+            self.hours, self.days = array("I", d["hours"]), array("I", d["days"])
+            self.hour, self.day = int(d["hour"]), int(d["day"])
+
+class ActivityStats:
+    def __init__(self):
+        self.rings: Dict[str, ActivityRing] = {k: ActivityRing() for k in ACTIVITY_KINDS}
+        self.version = 0
+        self.saved_version = 0
+
+    def add(self, kind: str, n: int = 1):
+        self.rings[kind].add(time.time(), n)
+        self.version += 1
+
+    def dump(self) -> Dict[str, Any]:
+        return {k: r.dump() for k, r in self.rings.items()}
+
+    def restore(self, saved: Dict[str, Any]):
+        for k, d in (saved or {}).items():
+            if k in self.rings:
+                self.rings[k].restore(d)
+
+_ACTIVITY_LABELS = {"like": "Likes", "pass": "Pass", "contact": "Contacts", "match": "Matchs", "onboarding": "Profils"}
+_SPARKS = "▁▂▃▄▅▆▇█"
+
+def _trend(cur: int, prev: int) -> str:
+    if not prev:
+        return f"{cur} (nv)" if cur else "0"
+    return f"{cur} ({(cur - prev) * 100 // prev:+d}%)"
+
+def activity_report(act: ActivityStats) -> str:
+    """Tableau 24 h / 7 j / 30 j (évolution vs période précédente), tendance 14 j et heures de pointe."""
+    now = time.time()
+    lines = [f"{'':9}{'24 h':>13}{'7 j':>13}{'30 j':>13}"]
+    for kind, ring in act.rings.items():
+        lines.append(
+            f"{_ACTIVITY_LABELS[kind]:9}"
+            f"{_trend(ring.last_hours(24, now=now), ring.last_hours(24, 24, now)):>13}"
+            f"{_trend(ring.last_days(7, now=now), ring.last_days(7, 7, now)):>13}"
+            f"{_trend(ring.last_days(30, now=now), ring.last_days(30, 30, now)):>13}"
+        )
+    daily = [sum(col) for col in zip(*(r.daily(14, now) for r in act.rings.values()))]
+    top = max(daily) or 1
+    spark = "".join(_SPARKS[min(len(_SPARKS) - 1, v * len(_SPARKS) // (top + 1))] if v else " " for v in daily)
+    hours = [sum(col) for col in zip(*(r.by_hour_of_day(now) for r in act.rings.values()))]
+    peaks = [h for h in sorted(range(24), key=lambda h: -hours[h])[:3] if hours[h]]
+    peak = ", ".join(f"{h}h ({hours[h]})" for h in peaks) or "—"
+    return "```\n" + "\n".join(lines) + f"\n\n14 j : {spark}\n```• Heures de pointe (7 j) : **{peak}**"
+
+activity: ActivityStats = _GuildLocal("activity")  # type: ignore[assignment]
 
-# Cooldowns mémoire
-like_cooldowns: Dict[Tuple[int, int], float]    = {}
-contact_cooldowns: Dict[Tuple[int, int], float] = {}
+like_cooldowns: CooldownStore = _GuildLocal("like_cooldowns")  # type: ignore[assignment]
+contact_cooldowns: CooldownStore = _GuildLocal("contact_cooldowns")  # type: ignore[assignment]
+
+# ================================================================
+# PARTITIONS PAR GUILDE
+# ================================================================
+# Une partition = Storage (fichiers propres à la guilde) + index + cooldowns.
+# Guilde principale : DATA_FILE / DB_FILE (inchangés) ; autres : GUILDS_DIR/<guild_id>.json|.db.
+# Ouverture à la première interaction de la guilde, déchargement après PARTITION_IDLE_S
+# d’inactivité : mémoire et démarrage suivent le nombre de guildes actives.
+class GuildPartition:
+    def __init__(self, guild_id: int):
+        self.guild_id = guild_id
+        self.home = guild_id == GUILD_ID
+        if self.home:
+            self.storage = Storage(DATA_FILE)
+        else:
+            base = os.path.join(GUILDS_DIR, str(guild_id))
+            self.storage = Storage(base + ".json", db_path=base + ".db")
+        self.profile_index = ProfileIndex()
+        self.search_index = SearchIndex()
+        self.like_cooldowns = CooldownStore(self.storage, "like", "like_cooldown", LIKE_COOLDOWN_DEFAULT)
+        self.contact_cooldowns = CooldownStore(self.storage, "contact", "contact_cooldown", CONTACT_COOLDOWN_DEFAULT)
+        self.activity = ActivityStats()
+        self.storage.profile_listeners += [self.profile_index.upsert, self.search_index.upsert]
+        self.storage.load_listeners += [self._restore_cooldowns, lambda: self.activity.restore(self.storage.data.get("activity"))]
+        self.last_used = time.monotonic()
+        self._opening: Optional[asyncio.Task] = None
+
+    def _restore_cooldowns(self):
+        # ancien emplacement (clé "cooldowns" des données) lu tant que le fichier annexe n’existe pas
+        saved = self.storage.side.get("cooldowns") or self.storage.data.get("cooldowns") or {}
+        self.like_cooldowns.restore(saved.get("like", []))
+        self.contact_cooldowns.restore(saved.get("contact", []))
+
+    async def open(self):
+        if self._opening is None:
+            self._opening = asyncio.create_task(self._open())
+        await asyncio.shield(self._opening)
+
+    async def _open(self):
+        await partitions.wait_closed(self.guild_id)  # on relit ce que le déchargement a écrit
+        if not self.home:
+            os.makedirs(GUILDS_DIR, exist_ok=True)
+        try:
+            await self.storage.open()
+        except StorageUnavailable:
+            self._opening = None
+            raise
+        self.storage.start()
+        for fn in partitions.open_listeners:
+            fn(self)
+
+    def has_live_speed(self) -> bool:
+        return any(not s.get("closed") for s in self.storage.data["speed_sessions"].values())
+
+class GuildPartitions:
+    def __init__(self):
+        self._parts: Dict[int, GuildPartition] = {}
+        self._closing: Dict[int, asyncio.Task] = {}  # partitions retirées, fermeture pas finie
+        self.open_listeners: List[Callable[[GuildPartition], None]] = []  # fn(partition) après chargement
+
+    def get(self, guild_id: int) -> GuildPartition:
+        part = self._parts.get(guild_id)
+        if part is None:
+            part = self._parts[guild_id] = GuildPartition(guild_id)
+        return part
+
+    @property
+    def home(self) -> GuildPartition:
+        return self.get(GUILD_ID)
+
+    def current(self) -> GuildPartition:
+        return self.get(_current_guild.get())
+
+    def loaded(self) -> List[GuildPartition]:
+        return [p for p in self._parts.values() if p.storage.ready.is_set()]
+
+    def is_loaded(self, guild_id: int) -> bool:
+        part = self._parts.get(guild_id)
+        return part is not None and part.storage.ready.is_set()
+
+    async def enter(self, guild_id: Optional[int]) -> GuildPartition:
+        """Fait de guild_id la guilde courante (tâche en cours) et attend que sa partition soit chargée."""
+        gid = int(guild_id or GUILD_ID)
+        _current_guild.set(gid)
+        await self.wait_closed(gid)
+        part = self.get(gid)
+        part.last_used = time.monotonic()
+        if not self.home.storage.ready.is_set():
+            await self.home.open()  # réglages des guildes, sessions DM
+        if not part.storage.ready.is_set():
+            await part.open()
+        return part
+
+    async def track_speed(self, guild_id: int):
+        """Retient les guildes ayant une soirée speed en cours : rouvertes au démarrage pour le minuteur."""
+        home = self.home.storage
+        live = home.data.get("speed_guilds", [])
+        if guild_id != GUILD_ID and guild_id not in live:
+            await home.set_value("speed_guilds", live + [guild_id])
+
+    async def open_speed_guilds(self):
+        home = self.home.storage
+        saved = home.data.get("speed_guilds", [])
+        live = []
+        for gid in saved:
+            part = self.get(int(gid))
+            await part.open()
+            if part.has_live_speed():
+                live.append(gid)
+        if live != saved:
+            await home.set_value("speed_guilds", live)
+
+    async def evict_idle(self, idle_s: float = PARTITION_IDLE_S) -> int:
+        """Referme les partitions inutilisées (hors principale et sessions speed en cours)."""
+        n = 0
+        for p in self.loaded():
+            # revérifié à chaque tour : un enter() a pu la réutiliser pendant la fermeture précédente
+            if p.home or time.monotonic() - p.last_used < idle_s or p.has_live_speed():
+                continue
+            if self._parts.get(p.guild_id) is not p:
+                continue
+            # retirée avant le premier await : un enter() concurrent ouvre une nouvelle partition,
+            # qui attend la fin de cette fermeture avant de relire les fichiers
+            self._parts.pop(p.guild_id)
+            task = self._closing[p.guild_id] = asyncio.create_task(self._close_partition(p))
+            try:
+                await task
+                n += 1
+            finally:
+                if self._closing.get(p.guild_id) is task:
+                    del self._closing[p.guild_id]
+        if n:
+            print(f"[PARTITIONS] {n} partition(s) inactive(s) déchargée(s)")
+        return n
+
+    async def _close_partition(self, p: GuildPartition):
+        try:
+            await snapshot_cooldowns(p)
+            await snapshot_activity(p)
+            await p.storage.close()
+        except Exception:
+            # écriture ratée : la partition reste chargée (lot remis en attente par flush())
+            self._parts.setdefault(p.guild_id, p)
+            p.storage.start()
+            raise
+
+    async def wait_closed(self, guild_id: int):
+        """Attend la fin d’un déchargement en cours de guild_id (sans relancer son erreur)."""
+        task = self._closing.get(guild_id)
+        if task is not None:
+            await asyncio.wait({task})
+
+    async def close(self):
+        for p in self.loaded():
+            try:
+                await snapshot_cooldowns(p)
+                await snapshot_activity(p)
+            except Exception:
+                metrics.swallowed("partition_snapshot")
+            try:
+                await p.storage.close()
+            except Exception as e:  # une partition illisible ne doit pas bloquer l’arrêt des autres
+                print(f"[STORAGE] Fermeture échouée ({p.guild_id}) : {e}")
+
+partitions = GuildPartitions()
+
+async def enter_interaction(inter: discord.Interaction) -> bool:
+    """partitions.enter() pour une interaction ; données illisibles → réponse d’erreur plutôt qu’un échec muet."""
+    try:
+        await partitions.enter(inter.guild_id)
+        return True
+    except StorageUnavailable:
+        await inter.response.send_message("⚠️ Données momentanément indisponibles, réessaie dans un instant.", ephemeral=True)
+        return False
+
+async def snapshot_cooldowns(part: GuildPartition, force: bool = False):
+    """Purge les cooldowns expirés et les persiste s’ils ont changé depuis le dernier snapshot."""
+    stores = (part.like_cooldowns, part.contact_cooldowns)
+    for cd in stores:
+        cd.sweep()
+    if not force and all(cd.version == cd.saved_version for cd in stores):
+        return
+    # fichier annexe : des dizaines de milliers de paires ne passent ni par le journal ni par le snapshot
+    await part.storage.set_side("cooldowns", {cd.name: cd.dump() for cd in stores})
+    for cd in stores:
+        cd.saved_version = cd.version
+    if part.storage.data.get("cooldowns") is not None:
+        await part.storage.set_value("cooldowns", None)  # migration : l’ancienne copie n’est plus lue
+
+async def snapshot_activity(part: GuildPartition):
+    act = part.activity
+    if act.version != act.saved_version:
+        act.saved_version = act.version
+        await part.storage.set_value("activity", act.dump())
+
+async def prune_speed_sessions(part: GuildPartition) -> int:
+    """Oublie les sessions closes de plus de SPEED_RETENTION_DAYS jours (les ouvertes restent)."""
+    since = time.time() - SPEED_RETENTION_DAYS * 86400
+    old = [sid for sid, s in part.storage.data["speed_sessions"].items()
+           if s.get("closed") and speed_session_ts(s) < since]
+    await part.storage.delete_speed_sessions(old)
+    return len(old)
+
+async def periodic_maintenance():
+    while True:
+        await asyncio.sleep(COOLDOWN_SNAPSHOT_S)
+        for part in partitions.loaded():
+            try:
+                await snapshot_cooldowns(part)
+                await snapshot_activity(part)
+            except Exception as e:
+                print(f"[COOLDOWN] Snapshot échoué ({part.guild_id}) : {e}")
+            try:
+                n = await prune_speed_sessions(part)
+                if n:
+                    print(f"[SPEED] {n} session(s) close(s) expirée(s) oubliée(s) ({part.guild_id})")
+            except Exception as e:
+                print(f"[SPEED] Purge échouée ({part.guild_id}) : {e}")
+        try:
+            await reap_dm_sessions()
+        except Exception as e:
+            print(f"[ONBOARDING] Purge échouée : {e}")
+        try:
+            await partitions.evict_idle()
+        except Exception as e:
+            print(f"[PARTITIONS] Déchargement échoué : {e}")
+
+async def notify_match(guild: discord.Guild, liker: discord.Member | discord.User, owner_id: int):
+    """Like réciproque : DM au propriétaire du profil + log."""
+    target = guild.get_member(owner_id) if guild else None
+    if target:
+        try:
+            await send_dm(
+                target,
+                f"💞 **C’est un match !** {liker.display_name} t’a liké(e) en retour.\n"
+                "📩 Utilise le bouton de contact sur son profil pour lui écrire."
+            )
+        except Exception:
+            metrics.swallowed("match_dm")
+    await send_log_embed(guild, "Match", f"💞 {liker.mention} × <@{owner_id}> — like réciproque", liker, 0xEC4899)
 
 # --------- Modal de contact ---------
 class ContactModal(discord.ui.Modal, title="💌 Premier message"):
@@ -274,6 +2299,10 @@ class ContactModal(discord.ui.Modal, title="💌 Premier message"):
         )
         self.add_item(self.message)
 
+    async def interaction_check(self, inter: discord.Interaction) -> bool:
+        return await enter_interaction(inter)
+
+    @instrumented("contact_submit")
     async def on_submit(self, inter: discord.Interaction):
         author = inter.user
         guild: Optional[discord.Guild] = inter.guild
@@ -292,18 +2321,18 @@ class ContactModal(discord.ui.Modal, title="💌 Premier message"):
 
         sent_ok = False
         try:
-            dm = await target.create_dm()
             txt = (
                 f"💌 **{author.display_name}** souhaite te parler !\n"
                 f"🗨️ « {content} »\n"
                 "💞 Tu peux répondre directement à ce message."
             )
-            await dm.send(txt)
+            await send_dm(target, txt)
             sent_ok = True
         except Exception:
-            sent_ok = False
+            metrics.swallowed("contact_dm")
 
         if sent_ok:
+            activity.add("contact")
             await inter.response.send_message("📨 Message envoyé avec succès 💞", ephemeral=True)
             excerpt = (content[:180] + "…") if len(content) > 180 else content
             await send_log_embed(
@@ -322,81 +2351,186 @@ class ProfileView(discord.ui.View):
         super().__init__(timeout=None)
         self.owner_id = owner_id
 
-    def _check_cd(self, store: Dict[Tuple[int,int], float], user_id: int, cooldown: int) -> bool:
-        key = (user_id, self.owner_id)
-        now = time.time()
-        if key in store and now - store[key] < cooldown:
+    def _owner(self, inter: discord.Interaction) -> int:
+        # Vue persistante (owner_id=0) après redémarrage → index message_id -> uid
+        if self.owner_id:
+            return self.owner_id
+        if inter.message is None:
+            return 0
+        return storage.owner_for_message(inter.message.id) or 0
+
+    async def interaction_check(self, inter: discord.Interaction) -> bool:
+        if not await enter_interaction(inter):
             return False
-        store[key] = now
-        return True
+        if self._owner(inter):
+            return True
+        await inter.response.send_message("⚠️ Ce profil n’existe plus.", ephemeral=True)
+        return False
 
     @discord.ui.button(emoji="❤️", style=discord.ButtonStyle.success, custom_id="profile_like")
+    @instrumented("like")
     async def like(self, inter: discord.Interaction, btn: discord.ui.Button):
-        if inter.user.id == self.owner_id:
+        owner_id = self._owner(inter)
+        if inter.user.id == owner_id:
             await inter.response.send_message("💡 Tu ne peux pas te liker toi-même.", ephemeral=True)
             return
-        if not self._check_cd(like_cooldowns, inter.user.id, int(storage.data.get("like_cooldown", LIKE_COOLDOWN))):
+        if not like_cooldowns.hit(inter.user.id, owner_id):
             await inter.response.send_message("⏳ Attends un peu avant de reliker ❤️", ephemeral=True)
             return
 
         await inter.response.defer(ephemeral=True)
+        mutual = await storage.add_like(inter.user.id, owner_id)
+        activity.add("like")
+        if mutual:
+            activity.add("match")
+        final = f"💞 **C’est un match** avec <@{owner_id}> ! Vous vous êtes likés mutuellement." if mutual else "❤️ Like enregistré."
+        route, msg = f"webhook:{inter.id}", None
         try:
-            msg = await inter.followup.send("💞 Une connexion se crée...", ephemeral=True)
+            msg = await rest.call(REST_COSMETIC, route, lambda: inter.followup.send("💞 Une connexion se crée...", ephemeral=True))
             await asyncio.sleep(1.0)
-            await msg.edit(content="🌹 Sentiment partagé ou simple curiosité ? Le temps nous le dira.")
+            await rest.call(REST_COSMETIC, route, lambda: msg.edit(content="🌹 Sentiment partagé ou simple curiosité ? Le temps nous le dira."))
             await asyncio.sleep(1.0)
-            await msg.edit(content="❤️ Like enregistré.")
+            await msg.edit(content=final)
+        except RestShed:  # sous charge : le résultat tout de suite, sans animation
+            await (msg.edit(content=final) if msg else inter.followup.send(final, ephemeral=True))
         except Exception:
-            await inter.followup.send("❤️ Like enregistré.", ephemeral=True)
+            metrics.swallowed("like_animation")
+            await inter.followup.send(final, ephemeral=True)
 
-        await send_log_embed(inter.guild, "Like", f"{inter.user.mention} a liké <@{self.owner_id}>", inter.user, 0xF472B6)
+        await send_log_embed(inter.guild, "Like", f"{inter.user.mention} a liké <@{owner_id}>", inter.user, 0xF472B6)
+        if mutual:
+            await notify_match(inter.guild, inter.user, owner_id)
 
     @discord.ui.button(emoji="❌", style=discord.ButtonStyle.secondary, custom_id="profile_pass")
+    @instrumented("pass")
     async def _pass(self, inter: discord.Interaction, btn: discord.ui.Button):
-        if inter.user.id == self.owner_id:
+        owner_id = self._owner(inter)
+        if inter.user.id == owner_id:
             await inter.response.send_message("🙃 Tu ne peux pas passer sur toi-même.", ephemeral=True)
             return
         await inter.response.send_message("👌 C’est noté.", ephemeral=True)
-        await send_log_embed(inter.guild, "Pass", f"{inter.user.mention} a passé <@{self.owner_id}>", inter.user, 0x9CA3AF)
+        activity.add("pass")
+        await send_log_embed(inter.guild, "Pass", f"{inter.user.mention} a passé <@{owner_id}>", inter.user, 0x9CA3AF)
 
     @discord.ui.button(emoji="📩", style=discord.ButtonStyle.primary, custom_id="profile_contact")
+    @instrumented("contact")
     async def contact(self, inter: discord.Interaction, btn: discord.ui.Button):
-        if inter.user.id == self.owner_id:
+        owner_id = self._owner(inter)
+        if inter.user.id == owner_id:
             await inter.response.send_message("🙃 Pas toi-même.", ephemeral=True)
             return
-        if not self._check_cd(contact_cooldowns, inter.user.id, int(storage.data.get("contact_cooldown", CONTACT_COOLDOWN))):
+        if not contact_cooldowns.hit(inter.user.id, owner_id):
             await inter.response.send_message("⏳ Attends un peu avant d’envoyer un nouveau message 💌", ephemeral=True)
             return
-        await inter.response.send_modal(ContactModal(target_id=self.owner_id))
+        await inter.response.send_modal(ContactModal(target_id=owner_id))
 
     @discord.ui.button(emoji="🗑️", style=discord.ButtonStyle.danger, custom_id="profile_delete")
+    @instrumented("delete")
     async def delete(self, inter: discord.Interaction, btn: discord.ui.Button):
-        if inter.user.id != self.owner_id and not inter.user.guild_permissions.administrator and not storage.is_owner(inter.user.id):
+        owner_id = self._owner(inter)
+        if inter.user.id != owner_id and not inter.user.guild_permissions.administrator and not storage.is_owner(inter.user.id):
             await inter.response.send_message("❌ Tu ne peux pas supprimer ce profil.", ephemeral=True)
             return
-        await full_profile_reset(inter.guild, self.owner_id, "Suppression via bouton", do_log=True)
+        await full_profile_reset(inter.guild, owner_id, "Suppression via bouton", do_log=True)
         await inter.response.send_message("✅ Profil supprimé et rôle retiré.", ephemeral=True)
 
 # --------- Accueil / DM ---------
-dm_sessions: Dict[int, Dict[str, Any]] = {}
-
-async def _send_next_step(dm_ch: discord.DMChannel, uid: int):
-    step = dm_sessions[uid]["step"]
-    prompts = [
-        "Quel est **ton âge** ? (nombre ≥ 18)",
-        "Ton **genre** ? (Femme / Homme)",
-        "Ton **attirance** (orientation) ? (ex : hétéro, bi, pan…)",
-        "Tes **passions** ? (quelques mots)",
-        "Ton **activité** (ce que tu fais dans la vie) ?",
-        "📸 Envoie une **photo** (fichier image) **ou** un **lien direct** (.png/.jpg/.webp).",
-    ]
-    if 0 <= step < len(prompts):
-        await dm_ch.send(f"{step+1}/6 — {prompts[step]}")
+# Sessions d’onboarding persistées (Storage « dm_sessions ») avec expiration :
+# un redémarrage reprend à la même étape, une session abandonnée est purgée.
+# Un DM n’a pas de guilde : les sessions vivent dans la partition principale
+# et retiennent la guilde d’origine (guild_id) où publier le profil.
+onboarding_stats: Dict[str, int] = {"started": 0, "completed": 0, "cancelled": 0, "refused": 0, "expired": 0}
+
+def _restore_onboarding_stats(part: GuildPartition):
+    if part.home:
+        saved = part.storage.data.get("onboarding_stats") or {}
+        for k in onboarding_stats:
+            onboarding_stats[k] = int(saved.get(k, 0))
+
+partitions.open_listeners.append(_restore_onboarding_stats)
+
+async def _count_onboarding(outcome: str):
+    onboarding_stats[outcome] += 1
+    await partitions.home.storage.set_value("onboarding_stats", dict(onboarding_stats))
+
+class StepError(Exception):
+    """Réponse refusée : le message est renvoyé en DM ; abort=True clôt la session."""
+    def __init__(self, message: str, abort: bool = False):
+        super().__init__(message)
+        self.abort = abort
+
+def _step_age(content: str, message: discord.Message, limit: int) -> int:
+    try:
+        age = int(re.sub(r"\D+", "", content))
+    except ValueError:
+        raise StepError("⚠️ Entre un nombre valide (ex: 22).")
+    if age < 18:
+        raise StepError("🚫 Désolé, réservé aux **18+**.", abort=True)
+    return age
+
+def _step_genre(content: str, message: discord.Message, limit: int) -> str:
+    g = content.lower()
+    if g.startswith("f"):
+        return "Femme"
+    if g.startswith("h"):
+        return "Homme"
+    raise StepError("⚠️ Réponds par **Femme** ou **Homme**.")
+
+def _step_text(content: str, message: discord.Message, limit: int) -> str:
+    return content[:limit] if content else "—"
+
+def _step_photo(content: str, message: discord.Message, limit: int) -> str:
+    if message.attachments:
+        att = message.attachments[0]
+        if att.content_type and att.content_type.startswith("image/"):
+            return att.url
+    if content.startswith("http") and re.search(r"\.(png|jpe?g|gif|webp)(\?|$)", content, re.I):
+        return content
+    raise StepError("⚠️ Envoie une **image** ou un **lien direct** (.png/.jpg/.webp).")
+
+# (champ, question, longueur max, validateur) — une ligne par étape
+ONBOARDING_STEPS: List[Tuple[str, str, int, Callable[[str, discord.Message, int], Any]]] = [
+    ("age",         "Quel est **ton âge** ? (nombre ≥ 18)",                                          0,   _step_age),
+    ("genre",       "Ton **genre** ? (Femme / Homme)",                                               0,   _step_genre),
+    ("orientation", "Ton **attirance** (orientation) ? (ex : hétéro, bi, pan…)",                     100, _step_text),
+    ("passions",    "Tes **passions** ? (quelques mots)",                                            200, _step_text),
+    ("activite",    "Ton **activité** (ce que tu fais dans la vie) ?",                               150, _step_text),
+    ("photo_url",   "📸 Envoie une **photo** (fichier image) **ou** un **lien direct** (.png/.jpg/.webp).", 0, _step_photo),
+]
+
+async def start_onboarding(uid: int, guild_id: int = GUILD_ID) -> Dict[str, Any]:
+    sess = {"step": 0, "answers": {}, "expires_at": time.time() + ONBOARDING_TTL_S, "guild_id": guild_id}
+    await partitions.home.storage.set_dm_session(uid, sess)
+    await _count_onboarding("started")
+    return sess
+
+async def end_onboarding(uid: int, outcome: str):
+    await partitions.home.storage.delete_dm_session(uid)
+    await _count_onboarding(outcome)
+
+async def reap_dm_sessions() -> int:
+    """Purge les sessions expirées (abandons)."""
+    now = time.time()
+    sessions = partitions.home.storage.data["dm_sessions"]
+    expired = [int(uid) for uid, s in sessions.items() if s.get("expires_at", 0) <= now]
+    for uid in expired:
+        await end_onboarding(uid, "expired")
+    if expired:
+        print(f"[ONBOARDING] {len(expired)} session(s) expirée(s) purgée(s)")
+    return len(expired)
+
+async def _send_next_step(dm_ch: discord.DMChannel, sess: Dict[str, Any]):
+    step = sess["step"]
+    if 0 <= step < len(ONBOARDING_STEPS):
+        await channel_send(dm_ch, REST_DM, f"{step+1}/{len(ONBOARDING_STEPS)} — {ONBOARDING_STEPS[step][1]}")
 
 class StartView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
+    async def interaction_check(self, inter: discord.Interaction) -> bool:
+        return await enter_interaction(inter)
+
     @discord.ui.button(label="✨ Créer mon profil", emoji="🌹", style=discord.ButtonStyle.success, custom_id="start_profile")
     async def start_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         if storage.is_banned(interaction.user.id):
@@ -405,25 +2539,24 @@ class StartView(discord.ui.View):
         await interaction.response.send_message("📩 Regarde tes **DM** pour commencer la création 💞", ephemeral=True)
         try:
             dm = await interaction.user.create_dm()
-            await dm.send(
+            await rest.call(REST_DM, f"dm:{interaction.user.id}", lambda: dm.send(
                 embed=discord.Embed(
                     title="💞 Création de ton profil",
                     description="Réponds aux questions pas à pas. Tu peux écrire `stop` pour annuler.",
                     color=BRAND_COLOR
                 )
-            )
-            dm_sessions[interaction.user.id] = {"step": 0, "answers": {}}
-            await _send_next_step(dm, interaction.user.id)
+            ))
+            sess = await start_onboarding(interaction.user.id, interaction.guild_id or GUILD_ID)
+            await _send_next_step(dm, sess)
         except Exception:
             await interaction.followup.send("⚠️ Impossible de t’écrire en DM (DM fermés ?).", ephemeral=True)
 
-async def ensure_welcome_panel(bot: commands.Bot):
-    if not CH_WELCOME:
-        return
-    guild = bot.get_guild(GUILD_ID)
-    if not guild:
+async def ensure_welcome_panel(guild: discord.Guild):
+    """Panneau d’accueil de la guilde courante (partitions.enter(guild.id) fait par l’appelant)."""
+    ch_welcome = guild_config(guild.id).ch_welcome
+    if not ch_welcome:
         return
-    ch = guild.get_channel(CH_WELCOME)
+    ch = guild.get_channel(ch_welcome)
     if not isinstance(ch, discord.TextChannel):
         return
 
@@ -433,7 +2566,7 @@ async def ensure_welcome_panel(bot: commands.Bot):
             await ch.fetch_message(ref["message_id"])
             return
         except Exception:
-            pass
+            metrics.swallowed("welcome_panel_fetch")
 
     description = (
         "✨ **Découvre, partage, connecte.**\n\n"
@@ -449,9 +2582,8 @@ async def ensure_welcome_panel(bot: commands.Bot):
     if guild.icon:
         embed.set_author(name=guild.name, icon_url=guild.icon.url)
     embed.set_footer(text="Miri Rencontre • Ensemble, ça matche 💞")
-    msg = await ch.send(embed=embed, view=StartView())
-    storage.data["welcome_panel"] = {"channel_id": ch.id, "message_id": msg.id}
-    await storage.save()
+    msg = await channel_send(ch, REST_MODERATION, embed=embed, view=StartView())
+    await storage.set_value("welcome_panel", {"channel_id": ch.id, "message_id": msg.id})
 
 # ================================================================
 # SPEED DATING — outils + rapport embed
@@ -463,19 +2595,21 @@ def nice_duration(seconds: int) -> str:
 
 async def send_speed_report_embed(
     guild: discord.Guild,
-    organizer: discord.Member,
+    organizer: discord.abc.Snowflake,
     duration_str: str,
-    created_threads: List[discord.Thread],
+    created_threads: List[Tuple[int, str]],
     started_at: datetime,
     closed_at: datetime,
 ):
-    if not guild or not CH_LOGS:
+    """created_threads = [(thread_id, nom)] : les threads peuvent déjà être supprimés."""
+    ch_logs = guild_config(guild.id).ch_logs if guild else 0
+    if not ch_logs:
         return
-    ch = guild.get_channel(CH_LOGS)
+    ch = guild.get_channel(ch_logs)
     if not isinstance(ch, discord.TextChannel):
         return
     desc = (
-        f"**Organisateur :** {organizer.mention}\n"
+        f"**Organisateur :** <@{organizer.id}>\n"
         f"**Durée :** {duration_str}\n"
         f"**Threads créés :** {len(created_threads)}"
     )
@@ -491,19 +2625,406 @@ async def send_speed_report_embed(
         inline=False
     )
     if created_threads:
-        lines = [f"• [{th.name}](https://discord.com/channels/{guild.id}/{th.id})" for th in created_threads[:10]]
+        lines = [f"• [{name}](https://discord.com/channels/{guild.id}/{tid})" for tid, name in created_threads[:10]]
         e.add_field(name="💬 Conversations", value="\n".join(lines), inline=False)
         if len(created_threads) > 10:
             e.add_field(name="…", value=f"+{len(created_threads)-10} threads supplémentaires", inline=False)
     e.set_footer(text="Miri Rencontre • Journal des événements")
+    await log_queue.put(ch, e)
+
+# -------- Rotation multi-tours --------
+class SpeedCompat:
+    """Classe (genre, attirance) calculée une fois par participant : la compatibilité
+    se teste par classe (quelques combinaisons) et non par paire de profils.
+    Un participant sans profil est compatible avec tout le monde (classe None)."""
+    def __init__(self, uids: List[int]):
+        self._cls: Dict[int, Optional[Tuple[Optional[str], frozenset]]] = {}
+        for uid in uids:
+            prof = storage.get_profile(uid)
+            self._cls[uid] = (prof.get("genre"), profile_attraction(prof)) if prof else None
+        self._ok: Dict[Tuple[Any, Any], bool] = {}
+
+    def key(self, uid: int) -> Optional[Tuple[Optional[str], frozenset]]:
+        return self._cls.get(uid)
+
+    def classes_ok(self, ca, cb) -> bool:
+        r = self._ok.get((ca, cb))
+        if r is None:
+            if ca is None or cb is None:
+                r = True
+            else:
+                r = (cb[0] in ca[1] or cb[0] is None) and (ca[0] in cb[1] or ca[0] is None)
+            self._ok[(ca, cb)] = r
+        return r
+
+    def __call__(self, a: int, b: int) -> bool:
+        return self.classes_ok(self._cls.get(a), self._cls.get(b))
+
+def speed_session_ts(s: Dict[str, Any]) -> float:
+    """Début d’une session (epoch) ; 0 si inconnu."""
+    if s.get("starts_at"):
+        return float(s["starts_at"])
     try:
-        await ch.send(embed=e)
-    except Exception:
-        pass
+        return datetime.fromisoformat(s.get("started_at") or "").timestamp()
+    except ValueError:
+        return 0.0
+
+def speed_history_pairs(days: int = SPEED_REMATCH_DAYS) -> set:
+    """Paires (min, max) formées lors des sessions des `days` derniers jours."""
+    since = time.time() - days * 86400
+    met = set()
+    for s in storage.data.get("speed_sessions", {}).values():
+        if speed_session_ts(s) < since:
+            continue
+        for rnd in s.get("rounds") or []:
+            for a, b in rnd:
+                met.add((min(a, b), max(a, b)))
+    return met
+
+def plan_rotation(
+    uids: List[int],
+    rounds: int,
+    per_round: int,
+    compat: "SpeedCompat",
+    history: set,
+) -> List[List[Tuple[int, int]]]:
+    """Tournoi toutes-rondes (méthode du cercle) : chaque rotation est un appariement parfait.
+    Les paires incompatibles, déjà formées dans ce plan ou vues récemment (history) sont écartées,
+    puis une passe gloutonne réapparie les laissés-pour-compte. Une rencontre récente n’est
+    qu’une pénalité : si elle seule empêche d’apparier quelqu’un, la paire est reformée.
+    Les restants ont une pause (bye)."""
+    players: List[Optional[int]] = list(uids)
+    random.shuffle(players)
+    if len(players) % 2:
+        players.append(None)  # bye
+    n = len(players)
+    if n < 2:
+        return []
+    met: set = set()  # paires de ce plan : jamais deux fois
+    fixed, rot = players[0], players[1:]
+    plan: List[List[Tuple[int, int]]] = []
+    # borne le nombre de rotations examinées quand peu de paires sont possibles
+    for _ in range(min(n - 1, rounds * 4)):
+        if len(plan) >= rounds:
+            break
+        order = [fixed] + rot
+        rot = rot[-1:] + rot[:-1]
+        pairs: List[Tuple[int, int]] = []
+        idle: List[int] = []
+        for i in range(n // 2):
+            a, b = order[i], order[n - 1 - i]
+            if a is None or b is None:
+                idle.extend(x for x in (a, b) if x is not None)
+                continue
+            key = (min(a, b), max(a, b))
+            if key in met or key in history or not compat(a, b):
+                idle.extend((a, b))
+            else:
+                pairs.append(key)
+        # d’abord sans rencontre récente, puis en l’acceptant pour ceux qui restent seuls
+        extra, idle = _greedy_pairs(idle, compat, lambda k: k in met or k in history)
+        pairs += extra
+        extra, idle = _greedy_pairs(idle, compat, lambda k: k in met)
+        pairs += extra
+        pairs = pairs[:per_round]
+        if pairs:
+            plan.append(pairs)
+            met.update(pairs)
+    return plan
+
+def _greedy_pairs(
+    idle: List[int],
+    compat: "SpeedCompat",
+    avoid: Callable[[Tuple[int, int]], bool],
+) -> Tuple[List[Tuple[int, int]], List[int]]:
+    """Passe gloutonne par classe (les classes incompatibles sont écartées d’un coup).
+    Renvoie (paires formées, laissés-pour-compte)."""
+    buckets: Dict[Any, List[int]] = {}
+    for a in idle:
+        buckets.setdefault(compat.key(a), []).append(a)
+    used: set = set()
+    pairs: List[Tuple[int, int]] = []
+    for a in idle:
+        if a in used:
+            continue
+        used.add(a)
+        ka = compat.key(a)
+        match = None
+        for kb, group in buckets.items():
+            if not compat.classes_ok(ka, kb):
+                continue
+            while group and group[0] in used:
+                group.pop(0)
+            match = next((b for b in group if b not in used and not avoid((min(a, b), max(a, b)))), None)
+            if match is not None:
+                break
+        if match is None:
+            used.discard(a)
+            continue
+        used.add(match)
+        pairs.append((min(a, match), max(a, match)))
+    return pairs, [a for a in idle if a not in used]
+
+async def provision_round(
+    ch_speed: discord.TextChannel,
+    pairs: List[Tuple[discord.Member, discord.Member]],
+    prefix: str,
+    ndur: str,
+    round_no: int,
+    n_rounds: int,
+    progress: Optional["InteractionProgress"] = None,
+) -> List[discord.Thread]:
+    """Crée les threads privés d’un tour en parallèle (SPEED_CONCURRENCY)."""
+    sem = asyncio.Semaphore(SPEED_CONCURRENCY)
+    tour = f" — tour **{round_no + 1}/{n_rounds}**" if n_rounds > 1 else ""
+
+    async def provision(a: discord.Member, b: discord.Member) -> Optional[discord.Thread]:
+        async with sem:
+            try:
+                th = await rest.call(REST_MODERATION, f"threads:{ch_speed.id}", lambda: ch_speed.create_thread(
+                    name=f"{prefix} {a.display_name} × {b.display_name}"[:100],
+                    type=discord.ChannelType.private_thread,
+                    invitable=False,
+                    auto_archive_duration=60
+                ), route_limit=SPEED_CONCURRENCY)
+                # même thread → même bucket : les deux ajouts partent ensemble
+                await asyncio.gather(*(rest.call(REST_MODERATION, f"thread-members:{th.id}", lambda m=m: th.add_user(m), route_limit=2) for m in (a, b)))
+                await channel_send(
+                    th, REST_MODERATION,
+                    f"Bienvenue {a.mention} et {b.mention}{tour} — vous avez **{ndur}** ⏳.\n"
+                    "Soyez respectueux·ses. Le fil sera **clôturé** à la fin."
+                )
+                return th
+            except Exception:
+                metrics.swallowed("speed_provision")
+                return None
+            finally:
+                if progress:
+                    await progress.step()
+
+    results = await asyncio.gather(*(provision(a, b) for a, b in pairs))
+    return [th for th in results if th is not None]
+
+async def close_speed_thread(th: discord.Thread, delete: bool, farewell: Optional[str] = None):
+    """Fin d’un fil speed : suppression, ou message d’au revoir puis archivage verrouillé."""
+    if delete:
+        await rest.call(REST_MODERATION, f"thread:{th.id}", th.delete)
+        return
+    if farewell:
+        await channel_send(th, REST_MODERATION, farewell)
+    await rest.call(REST_MODERATION, f"thread:{th.id}", lambda: th.edit(archived=True, locked=True))
+
+# -------- Minuteur durable des sessions --------
+# Les échéances se déduisent de speed_sessions (starts_at + n × round_seconds) : une seule
+# tâche pilotée par un tas sert toutes les sessions, et un redémarrage les recharge.
+# Étapes par tour r : "start:r" (r > 0), "warn:r", "end:r" ; chaque étape jouée va dans "done".
+async def resolve_threads(guild: discord.Guild, thread_ids: List[int], parent_id: int = 0) -> Dict[int, discord.Thread]:
+    """Cache de la guilde d’abord, puis un appel pour tous les threads actifs,
+    puis les archives (privées puis publiques) de parent_id paginées ; arrêt dès que tout est trouvé.
+    Les ids absents du résultat correspondent à des threads supprimés."""
+    found: Dict[int, discord.Thread] = {}
+    missing = set()
+    for tid in thread_ids:
+        th = guild.get_thread(tid)
+        if th:
+            found[tid] = th
+        else:
+            missing.add(tid)
+    if missing:
+        try:
+            for th in await guild.active_threads():
+                if th.id in missing:
+                    found[th.id] = th
+                    missing.discard(th.id)
+        except Exception:
+            metrics.swallowed("active_threads")
+    parent = guild.get_channel(parent_id or guild_config(guild.id).ch_speed)
+    for private in (True, False):
+        if not missing or not isinstance(parent, discord.TextChannel):
+            break
+        try:
+            async for th in parent.archived_threads(private=private, limit=None):
+                if th.id in missing:
+                    found[th.id] = th
+                    missing.discard(th.id)
+                    if not missing:
+                        break
+        except Exception:
+            metrics.swallowed("archived_threads")
+    return found
+
+class SpeedScheduler:
+    def __init__(self):
+        self.bot: Optional[commands.Bot] = None
+        self._heap: List[Tuple[float, int, str, str]] = []   # (échéance, guild_id, session_id, étape)
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    def start(self, bot: commands.Bot):
+        self.bot = bot
+        if self.load not in partitions.open_listeners:
+            partitions.open_listeners.append(self.load)  # guildes chargées plus tard
+        for part in partitions.loaded():
+            self.load(part)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def load(self, part: "GuildPartition"):
+        for sid, s in part.storage.data.get("speed_sessions", {}).items():
+            self._push(part.guild_id, sid, s)
+        self._wake.set()
+
+    def schedule(self, session_id: str):
+        s = storage.data["speed_sessions"].get(session_id)
+        if s:
+            self._push(_current_guild.get(), session_id, s)
+            self._wake.set()
+
+    def pending(self) -> int:
+        return len(self._heap)
+
+    @staticmethod
+    def _steps(s: Dict[str, Any]) -> List[Tuple[float, str]]:
+        if "round_seconds" not in s:  # session créée avant les tours multiples
+            steps = [(float(s["ends_at"]), "end:0")]
+            if s.get("warn_at") and not s.get("warned"):
+                steps.append((float(s["warn_at"]), "warn:0"))
+            return steps
+        base, dur = float(s["starts_at"]), int(s["round_seconds"])
+        steps = []
+        for r in range(len(s.get("rounds") or [[]])):
+            start = base + r * dur
+            if r:
+                steps.append((start, f"start:{r}"))
+            if dur >= 120:
+                steps.append((start + dur - 60, f"warn:{r}"))
+            steps.append((start + dur, f"end:{r}"))
+        return steps
+
+    @staticmethod
+    def _round_end(s: Dict[str, Any], r: int) -> float:
+        if "round_seconds" not in s:
+            return float(s["ends_at"])
+        return float(s["starts_at"]) + (r + 1) * int(s["round_seconds"])
+
+    @staticmethod
+    def _round_threads(s: Dict[str, Any], r: int) -> List[int]:
+        rt = s.get("round_threads")
+        if rt and r < len(rt):
+            return rt[r]
+        return s.get("threads", []) if r == 0 else []
+
+    def _push(self, gid: int, sid: str, s: Dict[str, Any]):
+        if s.get("closed") or not s.get("ends_at"):
+            return
+        done = set(s.get("done", []))
+        for when, step in self._steps(s):
+            if step not in done:
+                heapq.heappush(self._heap, (when, gid, sid, step))
+
+    async def _run(self):
+        await self.bot.wait_until_ready()
+        while True:
+            if not self._heap:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            when, gid, sid, step = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            task = asyncio.create_task(self._fire(gid, sid, step))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _fire(self, gid: int, sid: str, step: str):
+        await partitions.enter(gid)
+        s = storage.data["speed_sessions"].get(sid)
+        if not s or s.get("closed") or step in s.get("done", []):
+            return  # stoppée à la main, ou déjà jouée
+        kind, r = step.split(":")
+        r = int(r)
+        last = r >= len(s.get("rounds") or [[]]) - 1
+        s = {**s, "done": s.get("done", []) + [step]}
+        if kind == "end" and last:
+            s["closed"] = True
+        await storage.set_speed_session(sid, s)
+        # en retard (redémarrage) : on ne démarre/avertit plus un tour déjà fini
+        if kind != "end" and time.time() >= self._round_end(s, r):
+            return
+        guild = self.bot.get_guild(gid) if self.bot else None
+        if not guild:
+            return
+        try:
+            if kind == "start":
+                await self._start_round(sid, s, r, guild)
+            elif kind == "warn":
+                await self._warn(guild, self._round_threads(s, r))
+            else:
+                await self._end_round(guild, s, r, last)
+        except Exception as e:
+            print(f"[SPEED] Étape {step} de la session {sid} échouée : {e}")
+
+    async def _start_round(self, sid: str, s: Dict[str, Any], r: int, guild: discord.Guild):
+        ch = guild.get_channel(int(s.get("channel_id") or guild_config(guild.id).ch_speed))
+        if not isinstance(ch, discord.TextChannel):
+            return
+        pairs = []
+        for a, b in s["rounds"][r]:
+            ma, mb = guild.get_member(a), guild.get_member(b)
+            if ma and mb:
+                pairs.append((ma, mb))
+        threads = await provision_round(ch, pairs, s.get("name", "Speed ⏳"), s.get("duration", "?"), r, len(s["rounds"]))
+        cur = storage.data["speed_sessions"].get(sid)
+        if not cur:
+            return
+        rt = [list(x) for x in cur.get("round_threads", [])]
+        rt += [[] for _ in range(r + 1 - len(rt))]
+        rt[r] = [th.id for th in threads]
+        names = {**cur.get("thread_names", {}), **{str(th.id): th.name for th in threads}}
+        await storage.set_speed_session(sid, {
+            **cur,
+            "round_threads": rt,
+            "threads": cur.get("threads", []) + rt[r],
+            "thread_names": names,
+        })
+
+    async def _warn(self, guild: discord.Guild, thread_ids: List[int]):
+        threads = await resolve_threads(guild, thread_ids)
+        await for_each_bounded(
+            list(threads.values()),
+            lambda th: channel_send(th, REST_MODERATION, "⏰ **Plus qu’1 minute** ! Échangez vos contacts si ça matche 💞"),
+        )
+
+    async def _end_round(self, guild: discord.Guild, s: Dict[str, Any], r: int, last: bool):
+        delete = s.get("delete_after", True)
+        n_rounds = len(s.get("rounds") or [[]])
+        nxt = " Rendez-vous au tour suivant 🔄" if not last else ""
+
+        farewell = f"🔔 **Fin du tour {r + 1}/{n_rounds}** — merci à vous deux 💞.{nxt}"
+        threads = await resolve_threads(guild, self._round_threads(s, r), int(s.get("channel_id") or 0))
+        await for_each_bounded(list(threads.values()), lambda th: close_speed_thread(th, delete, farewell))
+        if not last:
+            return
+        closed_at = datetime.now(TZ)
+        started_at = datetime.fromisoformat(s["started_at"]).astimezone(TZ) if s.get("started_at") else closed_at
+        organizer = guild.get_member(int(s.get("organizer_id") or 0)) or discord.Object(id=int(s.get("organizer_id") or 0))
+        names = s.get("thread_names", {})
+        threads = [(tid, names.get(str(tid), f"#{tid}")) for tid in s.get("threads", [])]
+        await send_speed_report_embed(guild, organizer, s.get("duration", "?"), threads, started_at, closed_at)
+
+speed_scheduler = SpeedScheduler()
 
 # ================================================================
 # COGS & COMMANDES (sans décorateur guild pour éviter le bug enfant)
-#   → lier à la guilde via self.tree.sync(guild=GUILD_OBJ) dans on_ready
+#   → lier à chaque guilde servie via self.tree.sync(guild=…) dans on_ready
 # ================================================================
 class AdminCog(commands.Cog, name="Admin"):
     def __init__(self, bot: commands.Bot):
@@ -513,36 +3034,98 @@ class AdminCog(commands.Cog, name="Admin"):
     @app_commands.command(name="sync", description="Resynchroniser les commandes slash du bot (admin)")
     @app_commands.checks.has_permissions(administrator=True)
     async def sync_cmds(self, inter: discord.Interaction):
-        cmds = await inter.client.tree.sync(guild=inter.guild)
-        await inter.response.send_message(f"✅ {len(cmds)} commandes synchronisées.", ephemeral=True)
+        n = await sync_command_tree(inter.client, inter.guild, force=True)
+        await inter.response.send_message(f"✅ {n} commandes synchronisées.", ephemeral=True)
 
     # -------- Cooldowns --------
     @app_commands.command(name="setcooldown", description="Modifier le cooldown des interactions (admin)")
     @app_commands.describe(type="like ou contact", minutes="durée en minutes (min 1)")
     @app_commands.checks.has_permissions(administrator=True)
     async def setcooldown(self, inter: discord.Interaction, type: str, minutes: int):
-        global LIKE_COOLDOWN, CONTACT_COOLDOWN
         seconds = max(60, minutes * 60)
         if type.lower() == "like":
-            LIKE_COOLDOWN = seconds
-            storage.data["like_cooldown"] = seconds
+            await storage.set_value("like_cooldown", seconds)
         elif type.lower() == "contact":
-            CONTACT_COOLDOWN = seconds
-            storage.data["contact_cooldown"] = seconds
+            await storage.set_value("contact_cooldown", seconds)
         else:
             await inter.response.send_message("⚠️ Type invalide. Utilise `like` ou `contact`.", ephemeral=True)
             return
-        await storage.save()
         await inter.response.send_message(f"✅ Cooldown `{type}` mis à **{minutes} min**.", ephemeral=True)
         await send_log_embed(inter.guild, "Configuration modifiée", f"{inter.user.mention} a mis `{type}` à **{minutes} min**.", inter.user, 0x7DD3FC)
 
+    # -------- Configuration de la guilde --------
+    @app_commands.command(name="rencontre_setup", description="🧭 Salons et rôle de l’Espace Rencontre sur ce serveur (admin)")
+    @app_commands.describe(
+        role="rôle donné aux profils validés",
+        filles="salon des fiches filles",
+        garcons="salon des fiches garçons",
+        speed="salon des soirées speed dating",
+        logs="salon du journal",
+        accueil="salon du panneau d’accueil",
+    )
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rencontre_setup(
+        self,
+        inter: discord.Interaction,
+        role: Optional[discord.Role] = None,
+        filles: Optional[discord.TextChannel] = None,
+        garcons: Optional[discord.TextChannel] = None,
+        speed: Optional[discord.TextChannel] = None,
+        logs: Optional[discord.TextChannel] = None,
+        accueil: Optional[discord.TextChannel] = None,
+    ):
+        conf = guild_config(inter.guild_id)
+        for field, obj in (("role_access", role), ("ch_girls", filles), ("ch_boys", garcons),
+                           ("ch_speed", speed), ("ch_logs", logs), ("ch_welcome", accueil)):
+            if obj is not None:
+                setattr(conf, field, obj.id)
+        await set_guild_config(conf)
+        lines = [
+            f"• Rôle : {f'<@&{conf.role_access}>' if conf.role_access else '—'}",
+            *(f"• {label} : {f'<#{cid}>' if cid else '—'}" for label, cid in (
+                ("Filles", conf.ch_girls), ("Garçons", conf.ch_boys), ("Speed", conf.ch_speed),
+                ("Logs", conf.ch_logs), ("Accueil", conf.ch_welcome))),
+        ]
+        await inter.response.send_message("✅ **Configuration enregistrée**\n" + "\n".join(lines), ephemeral=True)
+        await send_log_embed(inter.guild, "Configuration modifiée", f"{inter.user.mention} a mis à jour les salons / rôle.", inter.user, 0x7DD3FC)
+        if accueil is not None:
+            try:
+                await ensure_welcome_panel(inter.guild)
+            except Exception as e:
+                print(f"[SETUP] Panneau d’accueil ({inter.guild_id}) : {e}")
+
+    # -------- Réconciliation des fiches --------
+    @app_commands.command(name="rencontre_reconcile", description="🧹 Réparer les fiches publiées (orphelines, doublons, manquantes) (admin)")
+    @app_commands.describe(simulation="True : compter sans rien modifier")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rencontre_reconcile(self, inter: discord.Interaction, simulation: bool = False):
+        await inter.response.defer(ephemeral=True, thinking=True)
+        progress = InteractionProgress(inter, "🔎 Analyse des salons de fiches", 2)
+        stats = await reconcile_profile_cards(inter.guild, dry_run=simulation, progress=progress)
+        title = "🧹 Réconciliation (simulation)" if simulation else "🧹 Réconciliation terminée"
+        await progress.done(f"**{title}**\n{reconcile_summary(stats)}")
+        if not simulation:
+            await send_log_embed(inter.guild, "Réconciliation des fiches", reconcile_summary(stats), inter.user, 0x7DD3FC)
+
+    @app_commands.command(name="rencontre_sweep", description="🧹 Supprimer les profils des membres partis (admin)")
+    @app_commands.describe(simulation="True : compter sans rien modifier")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rencontre_sweep(self, inter: discord.Interaction, simulation: bool = False):
+        await inter.response.defer(ephemeral=True, thinking=True)
+        progress = InteractionProgress(inter, "🧹 Suppression des profils orphelins", 1)
+        stats = await sweep_orphans(inter.guild, dry_run=simulation, progress=progress)
+        title = "🧹 Profils orphelins (simulation)" if simulation else "🧹 Profils orphelins supprimés"
+        await progress.done(f"**{title}**\n{sweep_summary(stats)}")
+        if not simulation and stats["removed"]:
+            await send_log_embed(inter.guild, "Balayage des profils orphelins", sweep_summary(stats), inter.user, 0x7DD3FC)
+
     # -------- Stats (admin) --------
     @app_commands.command(name="rencontre_stats", description="📊 Statistiques de l’Espace Rencontre (admin)")
     @app_commands.checks.has_permissions(administrator=True)
     async def rencontre_stats(self, inter: discord.Interaction):
         total = len(storage.data.get("profiles", {}))
         published = len(storage.data.get("profile_msgs", {}))
-        bans = len(storage.data.get("banned_users", []))
+        bans = len(storage.data["banned_users"])
         e = discord.Embed(
             title="📊 Statistiques — Miri Rencontre",
             description="Aperçu global 💞",
@@ -550,10 +3133,81 @@ class AdminCog(commands.Cog, name="Admin"):
             timestamp=datetime.now(timezone.utc)
         )
         e.add_field(name="👥 Profils", value=f"• Total : **{total}**\n• Publiés : **{published}**\n• Bannis : **{bans}**", inline=False)
-        e.add_field(name="⚙️ Paramètres", value=f"• ❤️ Like : **{storage.data.get('like_cooldown', LIKE_COOLDOWN)//60} min**\n• 💌 Contact : **{storage.data.get('contact_cooldown', CONTACT_COOLDOWN)//60} min**", inline=False)
+        e.add_field(name="💞 Likes", value=f"• Likes enregistrés : **{storage.like_count()}**", inline=False)
+        e.add_field(name="📈 Activité", value=activity_report(activity), inline=False)
+        e.add_field(name="⚙️ Paramètres", value=f"• ❤️ Like : **{storage.data.get('like_cooldown', LIKE_COOLDOWN_DEFAULT)//60} min**\n• 💌 Contact : **{storage.data.get('contact_cooldown', CONTACT_COOLDOWN_DEFAULT)//60} min**", inline=False)
+        st = storage.stats
+        avg = st["total_flush_ms"] / st["flushes"] if st["flushes"] else 0
+        e.add_field(
+            name="💾 Stockage",
+            value=f"• Mode : **{storage.mode}**\n• Écritures : **{int(st['writes'])}** (fusionnées : **{int(st['coalesced'])}**)\n"
+                  f"• Flushs : **{int(st['flushes'])}** — moy. **{avg:.1f} ms**, max **{st['max_flush_ms']:.1f} ms**",
+            inline=False
+        )
+        lq = log_queue.stats
+        e.add_field(
+            name="📘 Logs",
+            value=f"• En file : **{log_queue.depth()}**\n• Messages : **{lq['sent_messages']}** pour **{lq['sent_embeds']}** événements "
+                  f"(groupés : **{lq['batched']}**)\n• Ignorés sous charge : **{lq['dropped']}** — échecs : **{lq['failed']}**",
+            inline=False
+        )
+        ob = onboarding_stats
+        e.add_field(
+            name="🧭 Création de profil (DM)",
+            value=f"• En cours : **{len(partitions.home.storage.data['dm_sessions'])}** — démarrées : **{ob['started']}**\n"
+                  f"• Terminées : **{ob['completed']}** — abandonnées : **{ob['expired'] + ob['cancelled']}** "
+                  f"(expirées : **{ob['expired']}**) — refusées (-18) : **{ob['refused']}**",
+            inline=False
+        )
         e.set_footer(text="Miri Rencontre • Dashboard Admin")
         await inter.response.send_message(embed=e, ephemeral=True)
 
+    @app_commands.command(name="rencontre_metrics", description="📈 Latences, appels Discord et erreurs (admin)")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def rencontre_metrics(self, inter: discord.Interaction):
+        e = discord.Embed(title="📈 Métriques — Miri Rencontre", color=BRAND_COLOR, timestamp=datetime.now(timezone.utc))
+        lines = []
+        for (name, labels), h in sorted(metrics.histograms.items()):
+            if name != "rencontre_handler_latency_ms":
+                continue
+            n = int(sum(h[:-1]))
+            handler = dict(labels)["handler"]
+            p50 = metrics.quantile(name, 0.5, handler=handler)
+            p95 = metrics.quantile(name, 0.95, handler=handler)
+            errors = int(metrics.counters.get(("rencontre_handler_errors_total", labels), 0))
+            lines.append(f"• `{handler}` : **{n}** appels — moy. {h[-1] / n:.0f} ms, p50 ≤ {p50:g} ms, p95 ≤ {p95:g} ms, erreurs : {errors}")
+        e.add_field(name="⏱️ Handlers", value="\n".join(lines)[:1024] or "—", inline=False)
+        calls = sorted(metrics.total("discord_rest_requests_total").items(), key=lambda kv: -kv[1])
+        rl = metrics.counters.get(("discord_rate_limited_total", ()), 0)
+        grl = metrics.counters.get(("discord_global_rate_limited_total", ()), 0)
+        e.add_field(
+            name=f"🌐 API Discord — {int(sum(v for _, v in calls))} appels, 429 : {int(rl)} (global : {int(grl)})",
+            value="\n".join(f"• `{dict(labels)['route']}` : **{int(v)}**" for labels, v in calls[:8])[:1024] or "—",
+            inline=False
+        )
+        shed = int(sum(metrics.total("rencontre_rest_shed_total").values()))
+        queue_lines = []
+        for prio, cls in enumerate(_REST_CLASSES):
+            p95 = metrics.quantile("rencontre_rest_wait_ms", 0.95, priority=cls)
+            queue_lines.append(f"• `{cls}` : **{rest.depth(prio)}** en file — attente p95 ≤ {p95:g} ms" if p95 is not None
+                               else f"• `{cls}` : **{rest.depth(prio)}** en file")
+        e.add_field(name=f"🚦 Envois priorisés — abandons cosmétiques : {shed}", value="\n".join(queue_lines), inline=False)
+        swallowed = sorted(metrics.total("rencontre_swallowed_exceptions_total").items(), key=lambda kv: -kv[1])
+        e.add_field(
+            name="🙈 Exceptions ignorées",
+            value="\n".join(f"• `{dict(labels)['where']}` : **{int(v)}**" for labels, v in swallowed)[:1024] or "—",
+            inline=False
+        )
+        st = storage.stats
+        e.add_field(
+            name="💾 Stockage & files",
+            value=f"• Dernier flush : **{st['last_flush_ms']:.1f} ms**, **{st['last_flush_bytes'] / 1024:.1f} Ko** — en attente : **{len(storage._pending)}**\n"
+                  f"• File des logs : **{log_queue.depth()}** — étapes speed planifiées : **{speed_scheduler.pending()}**",
+            inline=False
+        )
+        e.set_footer(text=f"Prometheus : 127.0.0.1:{METRICS_PORT}/metrics" if METRICS_PORT else "Endpoint Prometheus désactivé")
+        await inter.response.send_message(embed=e, ephemeral=True)
+
     # -------- Groupes BAN & OWNERS --------
     ban_group = app_commands.Group(name="rencontreban", description="Gérer l'accès Rencontre (admin)")
     owners_group = app_commands.Group(name="owners", description="Gérer les propriétaires du bot")
@@ -572,6 +3226,37 @@ class AdminCog(commands.Cog, name="Admin"):
         await storage.unban(user.id)
         await inter.response.send_message(f"✅ **{user.display_name}** débanni.", ephemeral=True)
 
+    @ban_group.command(name="import", description="📥 Ban/déban en masse (mentions ou IDs)")
+    @app_commands.describe(membres="Mentions ou IDs séparés par espaces/virgules", retirer="True : débannir au lieu de bannir")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ban_import(self, inter: discord.Interaction, membres: str, retirer: bool = False):
+        ids = [int(x) for x in re.findall(r"\d{15,20}", membres)]
+        if not ids:
+            await inter.response.send_message("⚠️ Aucun ID reconnu.", ephemeral=True)
+            return
+        await inter.response.defer(ephemeral=True, thinking=True)
+        detail = ""
+        if retirer:
+            changed = await storage.unban_many(ids)
+            verb = "débannis"
+        else:
+            changed = await storage.ban_many(ids)
+            verb = "bannis"
+            # comme les départs : une seule écriture pour tous les profils, fiches supprimées par paquets
+            removed = await storage.delete_profiles_data(list(changed))
+            cards = await delete_profile_cards(inter.guild, removed)
+            await for_each_bounded(
+                [m for m in map(inter.guild.get_member, removed) if m],
+                lambda m: _remove_access_role(inter.guild, m),
+            )
+            detail = f" — **{len(removed)}** profil(s) supprimé(s), **{cards}** fiche(s) retirée(s)"
+        await inter.followup.send(f"✅ **{len(changed)}** membres {verb} ({len(set(ids)) - len(changed)} inchangés){detail}.", ephemeral=True)
+        await send_log_embed(
+            inter.guild, "Import de bans",
+            f"{inter.user.mention} a {verb} **{len(changed)}** membres en masse{detail}.",
+            inter.user, 0xF43F5E
+        )
+
     @ban_group.command(name="list", description="Voir la liste des bannis")
     async def ban_list(self, inter: discord.Interaction):
         ids = storage.list_bans()
@@ -599,7 +3284,7 @@ class AdminCog(commands.Cog, name="Admin"):
 
     @owners_group.command(name="list", description="Lister les owners")
     async def owners_list(self, inter: discord.Interaction):
-        ids = storage.data.get("owners", [])
+        ids = storage.list_owners()
         if not ids:
             await inter.response.send_message("Aucun owner défini.", ephemeral=True)
             return
@@ -619,14 +3304,19 @@ class HelpCog(commands.Cog, name="Aide"):
         user_help = (
             "• Panneau d’accueil → **✨ Créer mon profil**\n"
             "• Sur un profil : ❤️ / ❌ / 📩 / 🗑️\n"
-            "• `/rencontre_info` — infos publiques"
+            "• `/rencontre_info` — infos publiques\n"
+            "• `/rencontre_likes` — qui t’a liké, tes matchs\n"
+            "• `/rencontre_suggest` — profils compatibles (âge, attirance, passions)\n"
+            "• `/rencontre_search texte:<mots>` — chercher par passion / activité (filtres âge, genre, page)"
         )
         admin_help = (
-            "• `/speeddating participants:<mentions> couples:<n> duree:<30m> nom:<txt> delete_after:<bool>`\n"
+            "• `/speeddating participants:<mentions> couples:<n> duree:<30m> nom:<txt> delete_after:<bool> tours:<n>`\n"
             "• `/speeddating_list` / `/speeddating_stop` / `/speeddating_report`\n"
             "• `/setcooldown like|contact <minutes>`\n"
-            "• `/rencontre_stats`\n"
-            "• `/rencontreban add/remove/list`\n"
+            "• `/rencontre_setup` — salons et rôle de ce serveur\n"
+            "• `/rencontre_stats` • `/rencontre_metrics`\n"
+            "• `/rencontre_reconcile simulation:<bool>` • `/rencontre_sweep simulation:<bool>`\n"
+            "• `/rencontreban add/remove/list/import`\n"
             "• `/owners add/remove/list`\n"
             "• `/sync`"
         )
@@ -666,8 +3356,91 @@ class PublicInfoCog(commands.Cog, name="Infos"):
         e.set_footer(text="Miri Rencontre • Ensemble, ça matche ✨")
         await inter.response.send_message(embed=e, ephemeral=False)
 
+    @app_commands.command(name="rencontre_likes", description="💞 Voir qui t’a liké et tes matchs")
+    async def rencontre_likes(self, inter: discord.Interaction):
+        uid = inter.user.id
+        fans = storage.liked_by(uid)
+        matches = storage.matches_of(uid)
+        def fmt(ids: set) -> str:
+            if not ids:
+                return "—"
+            shown = [f"<@{i}>" for i in sorted(ids)[:25]]
+            more = f" … (+{len(ids) - 25})" if len(ids) > 25 else ""
+            return ", ".join(shown) + more
+        e = discord.Embed(title="💞 Tes likes", color=BRAND_COLOR, timestamp=datetime.now(timezone.utc))
+        e.add_field(name=f"💘 Matchs ({len(matches)})", value=fmt(matches), inline=False)
+        e.add_field(name=f"❤️ T’ont liké ({len(fans)})", value=fmt(fans - matches), inline=False)
+        e.add_field(name="➡️ Tu as liké", value=f"**{len(storage.likes_of(uid))}** profils", inline=False)
+        e.set_footer(text="Miri Rencontre • Ensemble, ça matche ✨")
+        await inter.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="rencontre_suggest", description="🔮 Profils compatibles avec le tien")
+    @app_commands.describe(nombre="Nombre de suggestions (1 à 10)")
+    async def rencontre_suggest(self, inter: discord.Interaction, nombre: int = 5):
+        uid = inter.user.id
+        if not storage.get_profile(uid):
+            await inter.response.send_message("Crée d’abord ton profil pour recevoir des suggestions 💌", ephemeral=True)
+            return
+        nombre = max(1, min(nombre, 10))
+        exclude = set(storage.likes_of(uid)) | set(storage.list_bans())
+        found = profile_index.suggest(uid, nombre, exclude=exclude)
+        if not found:
+            await inter.response.send_message("Aucun profil compatible pour l’instant… reviens plus tard ✨", ephemeral=True)
+            return
+        e = discord.Embed(title="🔮 Suggestions", color=BRAND_COLOR, timestamp=datetime.now(timezone.utc))
+        for other, score, common in found:
+            prof = storage.get_profile(other) or {}
+            words = ", ".join(profile_index.words(common)[:5]) or "—"
+            e.add_field(
+                name=f"{prof.get('age', '?')} ans • {prof.get('genre', '?')} • {int(score * 100)}%",
+                value=f"<@{other}>\nPassions communes : {words}",
+                inline=False
+            )
+        e.set_footer(text="Miri Rencontre • Ensemble, ça matche ✨")
+        await inter.response.send_message(embed=e, ephemeral=True)
+
+    @app_commands.command(name="rencontre_search", description="🔎 Chercher des profils par passion ou activité")
+    @app_commands.describe(
+        texte="Mots recherchés (début de mot accepté, accents ignorés)",
+        age_min="Âge minimum", age_max="Âge maximum",
+        genre="Filtrer par genre", page="Page de résultats"
+    )
+    @app_commands.choices(genre=[
+        app_commands.Choice(name="Femme", value="Femme"),
+        app_commands.Choice(name="Homme", value="Homme"),
+    ])
+    async def rencontre_search(
+        self,
+        inter: discord.Interaction,
+        texte: str,
+        age_min: int = 18,
+        age_max: int = 99,
+        genre: Optional[app_commands.Choice[str]] = None,
+        page: int = 1,
+    ):
+        found = [u for u in search_index.search(texte, age_min, age_max, genre.value if genre else None) if not storage.is_banned(u)]
+        if not found:
+            await inter.response.send_message("Aucun profil ne correspond à ta recherche 🔎", ephemeral=True)
+            return
+        size = SearchIndex.PAGE_SIZE
+        pages = (len(found) + size - 1) // size
+        page = max(1, min(page, pages))
+        e = discord.Embed(
+            title=f"🔎 « {texte[:50]} » — {len(found)} profil(s)",
+            color=BRAND_COLOR, timestamp=datetime.now(timezone.utc)
+        )
+        lines = []
+        for uid in found[(page - 1) * size: page * size]:
+            prof = storage.get_profile(uid) or {}
+            lines.append(f"<@{uid}> • {prof.get('age', '?')} ans • {prof.get('genre', '?')} — {(prof.get('passions') or '—')[:60]}")
+        e.description = "\n".join(lines)
+        e.set_footer(text=f"Page {page}/{pages} • Miri Rencontre")
+        await inter.response.send_message(embed=e, ephemeral=True)
+
 # -------- SpeedDating (création / list / stop / report) --------
 class SpeedCog(commands.Cog, name="Speed"):
+    LIST_CLOSED = 10  # sessions closes listées par /speeddating_list
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
@@ -680,8 +3453,10 @@ class SpeedCog(commands.Cog, name="Speed"):
         couples="Nombre maximum de couples (paires)",
         duree="Durée (ex 20m, 30m, 1h, 1h30…)",
         nom="Nom d’événement (préfixe des threads)",
-        delete_after="Supprimer les threads à la fin"
+        delete_after="Supprimer les threads à la fin",
+        tours="Nombre de tours (rotation des partenaires, max 10)"
     )
+    @instrumented("speeddating")
     async def speeddating(
         self,
         inter: discord.Interaction,
@@ -690,27 +3465,24 @@ class SpeedCog(commands.Cog, name="Speed"):
         duree: str = "20m",
         nom: Optional[str] = "Speed ⏳",
         delete_after: bool = True,
+        tours: int = 1,
     ):
         u = inter.user
         if not (u.guild_permissions.administrator or u.guild_permissions.manage_channels or storage.is_owner(u.id)):
             await inter.response.send_message("❌ Tu n’es pas autorisé(e) à lancer une soirée.", ephemeral=True)
             return
 
-        ch_speed = inter.guild.get_channel(CH_SPEED)
+        ch_speed = inter.guild.get_channel(guild_config(inter.guild_id).ch_speed)
         if not isinstance(ch_speed, discord.TextChannel):
-            await inter.response.send_message("❌ Salon Speed Dating introuvable (CH_SPEED).", ephemeral=True)
+            await inter.response.send_message("❌ Salon Speed Dating introuvable (CH_SPEED ou /rencontre_setup).", ephemeral=True)
             return
 
-        ids = [int(m) for m in re.findall(r"<@!?(\d+)>", participants)]
-        uniq_ids = []
-        for i in ids:
-            if i not in uniq_ids:
-                uniq_ids.append(i)
-        members: List[discord.Member] = []
+        uniq_ids = list(dict.fromkeys(int(m) for m in re.findall(r"<@!?(\d+)>", participants)))
+        members: Dict[int, discord.Member] = {}
         for i in uniq_ids:
             m = inter.guild.get_member(i)
             if m and not storage.is_banned(m.id):
-                members.append(m)
+                members[m.id] = m
 
         if len(members) < 2:
             await inter.response.send_message("⚠️ Il faut au moins 2 participants éligibles.", ephemeral=True)
@@ -718,74 +3490,47 @@ class SpeedCog(commands.Cog, name="Speed"):
 
         total_seconds = parse_duration_to_seconds(duree)
         ndur = nice_duration(total_seconds)
+        ids = list(members)
+        plan = plan_rotation(ids, max(1, min(tours, 10)), max(1, couples), SpeedCompat(ids), speed_history_pairs())
+        if not plan:
+            await inter.response.send_message("⚠️ Aucune paire compatible (genres / attirances des profils).", ephemeral=True)
+            return
 
-        random.shuffle(members)
-        pairs: List[Tuple[discord.Member, discord.Member]] = []
-        pool = members[:]
-        while len(pairs) < couples and len(pool) >= 2:
-            a = pool.pop()
-            b = pool.pop()
-            pairs.append((a, b))
-
-        created_threads: List[discord.Thread] = []
+        # Répondre tout de suite : le token d’interaction expire au bout de 3 s
+        await inter.response.defer(ephemeral=True, thinking=True)
         started_at = datetime.now(TZ)
         session_id = str(int(started_at.timestamp()))
+        prefix = (nom or "Speed ⏳").strip()
 
-        for a, b in pairs:
-            name = f"{(nom or 'Speed ⏳').strip()} {a.display_name} × {b.display_name}"
-            try:
-                th = await ch_speed.create_thread(
-                    name=name,
-                    type=discord.ChannelType.private_thread,
-                    invitable=False,
-                    auto_archive_duration=60
-                )
-                await th.add_user(a)
-                await th.add_user(b)
-                await th.send(
-                    f"Bienvenue {a.mention} et {b.mention} — vous avez **{ndur}** ⏳.\n"
-                    "Soyez respectueux·ses. Le fil sera **clôturé** à la fin."
-                )
-                created_threads.append(th)
-            except Exception:
-                continue
+        progress = InteractionProgress(inter, "🧵 Création des threads", len(plan[0]))
+        first = [(members[a], members[b]) for a, b in plan[0]]
+        created_threads = await provision_round(ch_speed, first, prefix, ndur, 0, len(plan), progress)
 
-        storage.data["speed_sessions"][session_id] = {
+        await storage.set_speed_session(session_id, {
             "threads": [t.id for t in created_threads],
             "name": nom or "Speed ⏳",
             "started_at": started_at.isoformat(),
             "delete_after": bool(delete_after),
-        }
-        await storage.save()
-
-        await inter.response.send_message(f"✅ **{len(created_threads)}** threads créés pour **{ndur}**. (session `{session_id}`)", ephemeral=True)
-
-        # minuterie
-        if total_seconds >= 120:
-            try:
-                await asyncio.sleep(total_seconds - 60)
-                for th in created_threads:
-                    try:
-                        await th.send("⏰ **Plus qu’1 minute** ! Échangez vos contacts si ça matche 💞")
-                    except Exception:
-                        pass
-                await asyncio.sleep(60)
-            except Exception:
-                pass
-        else:
-            await asyncio.sleep(total_seconds)
-
-        closed_at = datetime.now(TZ)
-        for th in created_threads:
-            try:
-                if delete_after:
-                    await th.delete()
-                else:
-                    await th.edit(archived=True, locked=True)
-            except Exception:
-                pass
-
-        await send_speed_report_embed(inter.guild, inter.user, ndur, created_threads, started_at, closed_at)
+            "guild_id": inter.guild.id,
+            "channel_id": ch_speed.id,
+            "organizer_id": u.id,
+            "duration": ndur,
+            # tours planifiés (sert aussi d’historique anti-répétition) + échéances reprises par speed_scheduler
+            "rounds": [[list(p) for p in rnd] for rnd in plan],
+            "round_threads": [[t.id for t in created_threads]],
+            "thread_names": {str(t.id): t.name for t in created_threads},
+            "starts_at": started_at.timestamp(),
+            "round_seconds": total_seconds,
+            "ends_at": started_at.timestamp() + total_seconds * len(plan),
+            "done": [],
+        })
+        speed_scheduler.schedule(session_id)
+        await partitions.track_speed(inter.guild_id)
+
+        byes = len(members) - 2 * len(plan[0])
+        extra = f" — **{len(plan)}** tours" if len(plan) > 1 else ""
+        pause = f" — {byes} en pause ce tour" if byes else ""
+        await progress.done(f"✅ **{len(created_threads)}** threads créés pour **{ndur}**{extra}{pause}. (session `{session_id}`)")
 
     @app_commands.command(name="speeddating_list", description="Lister les sessions SpeedDating actives/connues")
     async def speeddating_list(self, inter: discord.Interaction):
@@ -793,11 +3538,23 @@ class SpeedCog(commands.Cog, name="Speed"):
         if not sessions:
             await inter.response.send_message("Aucune session enregistrée.", ephemeral=True)
             return
-        lines = []
-        for sid, s in sessions.items():
+        # en cours d’abord, puis les closes les plus récentes ; description bornée (4096 car. max)
+        recent = sorted(sessions.items(), key=lambda kv: speed_session_ts(kv[1]), reverse=True)
+        open_ = [kv for kv in recent if not kv[1].get("closed")]
+        closed = [kv for kv in recent if kv[1].get("closed")]
+        lines, size = [], 0
+        shown = open_ + closed[:self.LIST_CLOSED]
+        for sid, s in shown:
             dt = s.get("started_at", "")[:16].replace("T", " ")
-            lines.append(f"• `{sid}` — {s.get('name','Speed ⏳')} — {len(s.get('threads', []))} threads — {dt}")
+            state = "✔️" if s.get("closed") else "🟢"
+            line = f"{state} `{sid}` — {s.get('name','Speed ⏳')[:50]} — {len(s.get('threads', []))} threads — {dt}"
+            if size + len(line) + 1 > 3900:
+                break
+            lines.append(line)
+            size += len(line) + 1
         e = discord.Embed(title="🗂️ Sessions SpeedDating", description="\n".join(lines), color=0xA78BFA)
+        if len(sessions) > len(lines):
+            e.set_footer(text=f"{len(lines)} sessions affichées sur {len(sessions)} (en cours + closes récentes)")
         await inter.response.send_message(embed=e, ephemeral=True)
 
     @app_commands.command(name="speeddating_stop", description="Clôturer une session : archiver/verrouiller ou supprimer")
@@ -808,22 +3565,14 @@ class SpeedCog(commands.Cog, name="Speed"):
         if not s:
             await inter.response.send_message("Session introuvable.", ephemeral=True)
             return
-        ch = inter.guild.get_channel(CH_SPEED)
-        done = 0
-        if isinstance(ch, discord.TextChannel):
-            for tid in s.get("threads", []):
-                try:
-                    th = await ch.fetch_thread(tid)
-                    if delete:
-                        await th.delete()
-                    else:
-                        await th.edit(archived=True, locked=True)
-                    done += 1
-                except Exception:
-                    continue
-        storage.data["speed_sessions"].pop(session_id, None)
-        await storage.save()
-        await inter.response.send_message(f"✅ Session `{session_id}` clôturée ({done} threads).", ephemeral=True)
+        await inter.response.defer(ephemeral=True, thinking=True)
+        # Marquée close (et non supprimée) : le minuteur l’ignore, l’historique des paires reste (SPEED_RETENTION_DAYS)
+        await storage.set_speed_session(session_id, {**s, "closed": True})
+        threads = await resolve_threads(inter.guild, s.get("threads", []), int(s.get("channel_id") or 0))
+        progress = InteractionProgress(inter, "🧹 Clôture des threads", len(threads))
+
+        done = await for_each_bounded(list(threads.values()), lambda th: close_speed_thread(th, delete), progress=progress)
+        await progress.done(f"✅ Session `{session_id}` clôturée ({done} threads).")
 
     @app_commands.command(name="speeddating_report", description="Forcer l’envoi d’un rapport (dernière session)")
     async def speeddating_report(self, inter: discord.Interaction, session_id: Optional[str] = None):
@@ -837,28 +3586,122 @@ class SpeedCog(commands.Cog, name="Speed"):
         if not s:
             await inter.response.send_message("Session introuvable.", ephemeral=True)
             return
-        ch = inter.guild.get_channel(CH_SPEED)
-        threads = []
-        if isinstance(ch, discord.TextChannel):
-            for tid in s.get("threads", []):
-                try:
-                    th = await ch.fetch_thread(tid)
-                    threads.append(th)
-                except Exception:
-                    continue
+        await inter.response.defer(ephemeral=True, thinking=True)
+        found = await resolve_threads(inter.guild, s.get("threads", []), int(s.get("channel_id") or 0))
+        threads = [(tid, found[tid].name) for tid in s.get("threads", []) if tid in found]
         started_at = datetime.fromisoformat(s.get("started_at")).astimezone(TZ) if s.get("started_at") else datetime.now(TZ)
-        await send_speed_report_embed(inter.guild, inter.user, "?", threads, started_at, datetime.now(TZ))
-        await inter.response.send_message("📨 Rapport envoyé.", ephemeral=True)
+        await send_speed_report_embed(inter.guild, inter.user, s.get("duration", "?"), threads, started_at, datetime.now(TZ))
+        await inter.followup.send(f"📨 Rapport envoyé ({len(threads)} threads retrouvés).", ephemeral=True)
 
 # ================================================================
 # BOT PRINCIPAL
 # ================================================================
-class RencontreBot(commands.Bot):
+def runtime_gauges() -> List[Tuple[str, Dict[str, str], float]]:
+    """Valeurs instantanées lues au moment du scrape (une série par partition chargée)."""
+    out: List[Tuple[str, Dict[str, str], float]] = [
+        ("rencontre_partitions_loaded", {}, len(partitions.loaded())),
+        ("rencontre_log_queue_depth", {}, log_queue.depth()),
+        ("rencontre_log_dropped_total", {}, log_queue.stats["dropped"]),
+        *(("rencontre_rest_queue_depth", {"priority": cls}, rest.depth(prio)) for prio, cls in enumerate(_REST_CLASSES)),
+        ("rencontre_departure_queue_depth", {}, departure_queue.depth()),
+        ("rencontre_speed_pending_steps", {}, speed_scheduler.pending()),
+        ("rencontre_dm_sessions", {}, len(partitions.home.storage.data["dm_sessions"])),
+    ]
+    for part in partitions.loaded():
+        st, data, g = part.storage.stats, part.storage.data, {"guild": str(part.guild_id)}
+        out += [
+            ("rencontre_profiles", g, len(data["profiles"])),
+            ("rencontre_profile_cards", g, len(data["profile_msgs"])),
+            ("rencontre_storage_pending", g, len(part.storage._pending)),
+            ("rencontre_storage_load_ms", g, st["load_ms"]),
+            ("rencontre_storage_writes_total", g, st["writes"]),
+            ("rencontre_storage_coalesced_total", g, st["coalesced"]),
+            ("rencontre_storage_last_flush_bytes", g, st["last_flush_bytes"]),
+            ("rencontre_storage_flush_bytes_total", g, st["total_flush_bytes"]),
+            ("rencontre_cooldown_entries", {**g, "kind": "like"}, len(part.like_cooldowns)),
+            ("rencontre_cooldown_entries", {**g, "kind": "contact"}, len(part.contact_cooldowns)),
+        ]
+    out += [("rencontre_onboarding_total", {"outcome": k}, v) for k, v in onboarding_stats.items()]
+    return out
+
+metrics.gauge_sources.append(runtime_gauges)
+
+class RencontreTree(app_commands.CommandTree):
+    async def interaction_check(self, inter: discord.Interaction) -> bool:
+        return await enter_interaction(inter)  # guilde courante ; attend ses données si elles chargent
+
+def command_tree_hash(tree: app_commands.CommandTree, guild: discord.abc.Snowflake, app_id: Optional[int]) -> str:
+    """Empreinte de ce que tree.sync(guild=…) enverrait (définitions triées par nom)."""
+    payload = []
+    for cmd in tree.get_commands(guild=guild):
+        try:
+            payload.append(cmd.to_dict(tree))  # discord.py ≥ 2.4
+        except TypeError:
+            payload.append(cmd.to_dict())
+    payload.sort(key=lambda c: (c.get("type", 1), c["name"]))
+    blob = json.dumps({"app": app_id, "guild": guild.id, "commands": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+async def sync_command_tree(bot: commands.Bot, guild: discord.abc.Snowflake, force: bool = False) -> Optional[int]:
+    """Synchronise seulement si l’arbre a changé depuis la dernière synchro (empreinte persistée).
+    Renvoie le nombre de commandes synchronisées, ou None si rien n’a changé."""
+    digest = command_tree_hash(bot.tree, guild, bot.application_id)
+    home = partitions.home.storage  # empreintes de toutes les guildes au même endroit
+    saved = home.data.get("command_sync") or {}
+    if not force and saved.get("hashes", {}).get(str(guild.id)) == digest:
+        return None
+    cmds = await bot.tree.sync(guild=guild)
+    hashes = {**saved.get("hashes", {}), str(guild.id): digest}
+    await home.set_value("command_sync", {"hashes": hashes, "synced_at": datetime.now(timezone.utc).isoformat()})
+    return len(cmds)
+
+# AUTO_SHARD=1 : shards gérés par discord.py ; les membres d’une guilde ne sont chargés
+# (chunk) qu’à l’ouverture de sa partition, pas pour toutes les guildes au démarrage.
+_BotBase = commands.AutoShardedBot if AUTO_SHARD else commands.Bot
+
+class RencontreBot(_BotBase):
     def __init__(self):
-        super().__init__(command_prefix="!", intents=intents)
+        super().__init__(command_prefix="!", intents=intents, tree_cls=RencontreTree,
+                         chunk_guilds_at_startup=not AUTO_SHARD)
         self.synced = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._storage_task: Optional[asyncio.Task] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        self._reconciled = False
+        self._boot_t0 = time.perf_counter()
+
+    async def _open_storage(self):
+        await partitions.home.open()
+        speed_scheduler.start(self)
+        await partitions.open_speed_guilds()  # soirées speed en cours sur d’autres guildes
+        self._maintenance_task = asyncio.create_task(periodic_maintenance())
+        if SWEEP_INTERVAL_S:
+            self._sweep_task = asyncio.create_task(orphan_sweeper(self))
+
+    def _chunk_partition_guild(self, part: GuildPartition):
+        guild = self.get_guild(part.guild_id)
+        if guild and not guild.chunked:
+            asyncio.create_task(guild.chunk())
 
     async def setup_hook(self):
+        # les données se chargent pendant la connexion au gateway (setup_hook précède le login WS)
+        self._storage_task = asyncio.create_task(self._open_storage())
+        departure_queue.start()
+        rest.start()
+        if AUTO_SHARD:
+            partitions.open_listeners.append(self._chunk_partition_guild)
+        log_queue.start()
+        instrument_http(self)
+        if METRICS_PORT:
+            try:
+                await metrics.serve(METRICS_PORT)
+            except OSError as e:
+                print(f"[METRICS] Port {METRICS_PORT} indisponible : {e}")
+        try:
+            # docker stop → SIGTERM : fermeture propre pour vider le write-behind
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, lambda: asyncio.create_task(self.close()))
+        except (NotImplementedError, RuntimeError):
+            pass
         await self.add_cog(AdminCog(self))
         await self.add_cog(HelpCog(self))
         await self.add_cog(PublicInfoCog(self))
@@ -867,127 +3710,159 @@ class RencontreBot(commands.Bot):
         self.add_view(ProfileView(owner_id=0))
         self.add_view(StartView())
 
+    async def _sync_guild(self, guild: discord.abc.Snowflake):
+        try:
+            # Synchro GUILD-ONLY → évite l’erreur “child commands … default guilds”
+            n = await sync_command_tree(self, guild)
+            if n is None:
+                print(f"[SYNC] Commandes inchangées ({guild.id}) — synchro ignorée")
+            else:
+                print(f"[SYNC] {n} commandes guild synchronisées ({guild.id}) ✅")
+        except Exception as e:
+            print(f"[SYNC FAIL] {guild.id} : {e}")
+
     async def on_ready(self):
+        try:
+            await self._storage_task
+        except Exception as e:
+            # sans la partition principale (réglages, sessions DM) le bot ne peut rien servir
+            print(f"[STORAGE] Données principales illisibles — arrêt du bot : {e}")
+            await self.close()
+            return
+        if AUTO_SHARD:
+            # partitions ouvertes dans setup_hook : guildes encore inconnues à ce moment-là
+            for part in partitions.loaded():
+                self._chunk_partition_guild(part)
         if not self.synced:
-            try:
-                # Synchro GUILD-ONLY → évite l’erreur “child commands … default guilds”
-                await self.tree.sync(guild=GUILD_OBJ)
-                self.synced = True
-                print(f"[SYNC] Commandes guild synchronisées ({GUILD_ID}) ✅")
-            except Exception as e:
-                print(f"[SYNC FAIL] {e}")
+            self.synced = True
+            # toutes les guildes du bot : une guilde pas encore configurée doit voir /rencontre_setup
+            for guild in self.guilds:
+                await self._sync_guild(guild)
 
-        print(f"✅ Connecté comme {self.user} (id={self.user.id})")
+        print(f"✅ Connecté comme {self.user} (id={self.user.id}) — prêt en {time.perf_counter() - self._boot_t0:.1f} s")
         await self.change_presence(status=discord.Status.online, activity=discord.Game("Miri Rencontre 🌹"))
-        await ensure_welcome_panel(self)
+        # guilde principale seulement : les autres posent leur panneau via /rencontre_setup
+        guild = self.get_guild(GUILD_ID)
+        if guild:
+            await partitions.enter(GUILD_ID)
+            await ensure_welcome_panel(guild)
+        if RECONCILE_ON_START and not self._reconciled:
+            self._reconciled = True
+            asyncio.create_task(self._reconcile_on_start())
+
+    async def on_guild_available(self, guild: discord.Guild):
+        if AUTO_SHARD and partitions.is_loaded(guild.id):
+            self._chunk_partition_guild(partitions.get(guild.id))
+
+    async def on_guild_join(self, guild: discord.Guild):
+        await self._sync_guild(guild)
+
+    async def _reconcile_on_start(self):
+        guild = self.get_guild(GUILD_ID)
+        if not guild:
+            return
+        await partitions.enter(GUILD_ID)
+        try:
+            stats = await reconcile_profile_cards(guild)
+            print(f"[RECONCILE] {stats}")
+            await send_log_embed(guild, "Réconciliation des fiches (démarrage)", reconcile_summary(stats), None, 0x7DD3FC)
+        except Exception as e:
+            print(f"[RECONCILE FAIL] {e}")
 
+    async def close(self):
+        try:
+            await departure_queue.close()  # avant les logs et le stockage : le dernier lot s’y écrit
+            await log_queue.close()
+            await rest.close()  # après les files qui l’alimentent
+            await metrics.close()
+            await partitions.close()  # partitions chargées seulement : pas de snapshot vide en plein chargement
+        finally:
+            await super().close()
+
+    @instrumented("on_message")
     async def on_message(self, message: discord.Message):
         await self.process_commands(message)
         if message.author.bot or message.guild is not None:
             return
+        home = (await partitions.enter(GUILD_ID)).storage  # sessions DM : partition principale
         uid = message.author.id
-        if uid not in dm_sessions:
+        sess = home.get_dm_session(uid)
+        if sess is None:
             return
-        sess = dm_sessions[uid]
         dm_ch: discord.DMChannel = message.channel  # type: ignore
+        if sess.get("expires_at", 0) <= time.time():
+            await end_onboarding(uid, "expired")
+            await channel_send(dm_ch, REST_DM, "⌛ Ta création de profil a expiré. Reclique sur **Créer mon profil** pour recommencer.")
+            return
         content = (message.content or "").strip()
 
         if content.lower() == "stop":
-            await dm_ch.send("🚫 Création annulée.")
-            dm_sessions.pop(uid, None)
+            await channel_send(dm_ch, REST_DM, "🚫 Création annulée.")
+            await end_onboarding(uid, "cancelled")
             return
 
-        # Étapes DM
-        if sess["step"] == 0:
-            try:
-                age = int(re.sub(r"\D+", "", content))
-                if age < 18:
-                    await dm_ch.send("🚫 Désolé, réservé aux **18+**.")
-                    dm_sessions.pop(uid, None)
-                    return
-                sess["answers"]["age"] = age
-                sess["step"] = 1
-                await _send_next_step(dm_ch, uid)
-            except Exception:
-                await dm_ch.send("⚠️ Entre un nombre valide (ex: 22).")
+        step = sess["step"]
+        if not 0 <= step < len(ONBOARDING_STEPS):
+            await end_onboarding(uid, "cancelled")
+            return
+        field, _, limit, validate = ONBOARDING_STEPS[step]
+        try:
+            value = validate(content, message, limit)
+        except StepError as e:
+            await channel_send(dm_ch, REST_DM, str(e))
+            if e.abort:
+                await end_onboarding(uid, "refused")
             return
 
-        if sess["step"] == 1:
-            g = content.lower()
-            if g.startswith("f"):
-                sess["answers"]["genre"] = "Femme"
-            elif g.startswith("h"):
-                sess["answers"]["genre"] = "Homme"
-            else:
-                await dm_ch.send("⚠️ Réponds par **Femme** ou **Homme**.")
-                return
-            sess["step"] = 2
-            await _send_next_step(dm_ch, uid)
-            return
-
-        if sess["step"] == 2:
-            sess["answers"]["orientation"] = content[:100] if content else "—"
-            sess["step"] = 3
-            await _send_next_step(dm_ch, uid)
-            return
-
-        if sess["step"] == 3:
-            sess["answers"]["passions"] = content[:200] if content else "—"
-            sess["step"] = 4
-            await _send_next_step(dm_ch, uid)
-            return
-
-        if sess["step"] == 4:
-            sess["answers"]["activite"] = content[:150] if content else "—"
-            sess["step"] = 5
-            await _send_next_step(dm_ch, uid)
-            return
-
-        if sess["step"] == 5:
-            photo_url = None
-            if message.attachments:
-                att = message.attachments[0]
-                if att.content_type and att.content_type.startswith("image/"):
-                    photo_url = att.url
-            if (not photo_url) and content.startswith("http") and re.search(r"\.(png|jpe?g|gif|webp)(\?|$)", content, re.I):
-                photo_url = content
-            if not photo_url:
-                await dm_ch.send("⚠️ Envoie une **image** ou un **lien direct** (.png/.jpg/.webp).")
-                return
-
-            sess["answers"]["photo_url"] = photo_url
-            profile = sess["answers"]
-            await storage.set_profile(uid, profile)
-
-            guild = self.get_guild(GUILD_ID)
-            if guild:
-                member = guild.get_member(uid)
-                if member:
-                    await publish_or_update_profile(guild, member, profile)
-                    await send_log_embed(guild, "Création de profil", f"{member.mention} a créé son profil 💞", member, 0xA855F7)
-                    if ROLE_ACCESS:
-                        role = guild.get_role(ROLE_ACCESS)
-                        if role and role not in member.roles:
-                            try:
-                                await member.add_roles(role, reason="Profil Rencontre validé")
-                            except Exception:
-                                pass
-
-            dm_sessions.pop(uid, None)
-            await dm_ch.send("✅ **Profil enregistré !** Il est maintenant visible sur le serveur 💞")
+        # nouvelle session plutôt que muter celle du stockage (write-behind : déjà référencée)
+        sess = {**sess, "answers": {**sess["answers"], field: value},
+                "step": step + 1, "expires_at": time.time() + ONBOARDING_TTL_S}
+        if sess["step"] < len(ONBOARDING_STEPS):
+            await home.set_dm_session(uid, sess)
+            await _send_next_step(dm_ch, sess)
             return
 
+        gid = int(sess.get("guild_id") or GUILD_ID)
+        await partitions.enter(gid)  # profil publié sur la guilde où la création a commencé
+        profile = sess["answers"]
+        await storage.set_profile(uid, profile)
+
+        guild = self.get_guild(gid)
+        if guild:
+            member = guild.get_member(uid)
+            if member:
+                await publish_or_update_profile(guild, member, profile)
+                await send_log_embed(guild, "Création de profil", f"{member.mention} a créé son profil 💞", member, 0xA855F7)
+                role_id = guild_config(gid).role_access
+                if role_id:
+                    role = guild.get_role(role_id)
+                    if role and role not in member.roles:
+                        try:
+                            await rest.call(REST_MODERATION, f"roles:{guild.id}",
+                                            lambda: member.add_roles(role, reason="Profil Rencontre validé"))
+                        except Exception:
+                            metrics.swallowed("onboarding_role")
+
+        activity.add("onboarding")
+        await end_onboarding(uid, "completed")
+        await channel_send(dm_ch, REST_DM, "✅ **Profil enregistré !** Il est maintenant visible sur le serveur 💞")
+
+    @instrumented("member_remove")
     async def on_member_remove(self, member: discord.Member):
-        # Nettoyage silencieux (aucun log de leave)
+        # Départs regroupés (DepartureQueue) : un log récapitulatif par lot, guildes servies seulement
+        await partitions.home.open()
+        if member.guild.id not in configured_guild_ids() and not partitions.is_loaded(member.guild.id):
+            return
         try:
-            await full_profile_reset(member.guild, member.id, reason="Départ du serveur", do_log=False)
+            await departure_queue.put(member)
         except Exception:
-            pass
+            metrics.swallowed("member_remove")
 
 # ------------------------------------------------
 # LANCEMENT
 # ------------------------------------------------
-if not DISCORD_TOKEN:
-    raise RuntimeError("❌ DISCORD_TOKEN manquant dans l'environnement.")
-bot = RencontreBot()
-bot.run(DISCORD_TOKEN)
+if __name__ == "__main__":  # importable sans connexion (bench_rencontre.py)
+    if not DISCORD_TOKEN:
+        raise RuntimeError("❌ DISCORD_TOKEN manquant dans l'environnement.")
+    bot = RencontreBot()
+    bot.run(DISCORD_TOKEN)